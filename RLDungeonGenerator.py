@@ -1,18 +1,34 @@
 # This code is released into the Public Domain.
+from array import array
+from collections import OrderedDict
+from collections import deque
+from math import isqrt
 from math import sqrt
-from random import random
-from random import randrange
-from random import choice
+from contextlib import contextmanager
+from random import Random
 import argparse
+import hashlib
+import mmap
 import os
+import struct
 import sys
 import time
 
-try:
-    import tcod
-    import tcod.tileset
-except Exception:
-    tcod = None
+from dungeon_export import EXPORT_BUFFER_SIZE
+from dungeon_export import EXPORT_FORMATS
+from dungeon_export import SEED_LIMIT
+from dungeon_export import export_maps
+
+# Tile codes stored in the packed grid are the byte values of the glyphs
+WALL = ord('#')
+FLOOR = ord('.')
+DOOR = ord('+')
+WALKABLE = (FLOOR, DOOR)
+WALKABLE_TABLE = bytes(1 if code in WALKABLE else 0 for code in range(256))
+# Tiles that let light through for field of view (walls are the only blockers)
+TRANSPARENT_TABLE = WALKABLE_TABLE
+# room_ids value for tiles that are not inside a room
+NO_ROOM = -1
 
 class DungeonSqr:
     def __init__(self, sqr):
@@ -21,6 +37,44 @@ class DungeonSqr:
     def get_ch(self):
         return self.sqr
 
+# Thin views over the packed tile grid so dungeon[r][c].get_ch() keeps working.
+# Reads hand back a fresh DungeonSqr, writes store the square's glyph byte.
+class DungeonRow:
+    def __init__(self, tiles, start, width):
+        self.tiles = tiles
+        self.start = start
+        self.width = width
+
+    def _index(self, c):
+        if c < 0:
+            c += self.width
+        if c < 0 or c >= self.width:
+            raise IndexError('dungeon column out of range')
+        return self.start + c
+
+    def __len__(self):
+        return self.width
+
+    def __getitem__(self, c):
+        return DungeonSqr(chr(self.tiles[self._index(c)]))
+
+    def __setitem__(self, c, sqr):
+        self.tiles[self._index(c)] = ord(sqr.get_ch())
+
+class DungeonGrid:
+    def __init__(self, dg):
+        self.dg = dg
+
+    def __len__(self):
+        return self.dg.height
+
+    def __getitem__(self, r):
+        if r < 0:
+            r += self.dg.height
+        if r < 0 or r >= self.dg.height:
+            raise IndexError('dungeon row out of range')
+        return DungeonRow(self.dg.tiles, r * self.dg.width, self.dg.width)
+
 class Room:
     def __init__(self, r, c, h, w):
         self.row = r
@@ -28,14 +82,206 @@ class Room:
         self.height = h
         self.width = w
 
+# Straight corridor between two rooms, as planned before any tile is written:
+# along row `line` over columns [start, end) for kind 'rows', or down column
+# `line` over rows [start, end) for kind 'cols'.
+class Corridor:
+    def __init__(self, kind, line, start, end):
+        self.kind = kind
+        self.line = line
+        self.start = start
+        self.end = end
+
+    def __len__(self):
+        return max(0, self.end - self.start)
+
+    def doors(self):
+        # (row, col) of the doors carved at the corridor's ends
+        if self.end - self.start >= 4:
+            ends = (self.start, self.end - 1)
+        elif self.start == self.end - 1:
+            ends = (self.start,)
+        else:
+            ends = ()
+        if self.kind == 'rows':
+            return [(self.line, k) for k in ends]
+        return [(k, self.line) for k in ends]
+
+def find_root(parent, i):
+    while parent[i] != i:
+        parent[i] = parent[parent[i]]
+        i = parent[i]
+    return i
+
+def derive_seed(seed, *parts):
+    # Stable 63-bit seed for a sub-part of a map (a chunk, a subtree, a level...).
+    # Hashing keeps it independent of PYTHONHASHSEED and of the order parts are
+    # built in; 63 bits so it fits the seed field of saves and packed records.
+    digest = hashlib.sha256(repr((seed,) + parts).encode('utf-8')).digest()
+    return int.from_bytes(digest[:8], 'little') & (SEED_LIMIT - 1)
+
+# Scan directions for shadowcasting as (row, col) steps per unit of depth and
+# per column across the scan line: north, south, east, west
+FOV_QUADRANTS = ((-1, 0, 0, 1), (1, 0, 0, 1), (0, 1, 1, 0), (0, -1, 1, 0))
+# (tile, radius) fields of view kept per map before the least recently used is dropped
+FOV_CACHE_SIZE = 1024
+
+def shadowcast(transparent, width, height, row, col, radius):
+    # Symmetric shadowcasting (Albert Ford's formulation) over a one-byte-per-tile
+    # transparency mask. Returns the sorted flat indexes of every tile visible
+    # from (row, col) within radius, walls included. Slopes are kept as integer
+    # fractions (num, den) so the scan is exact and float free.
+    visible = {row * width + col}
+    limit = radius * radius
+    for depth_dr, depth_dc, col_dr, col_dc in FOV_QUADRANTS:
+        stack = [(1, -1, 1, 1, 1)]
+        while stack:
+            depth, start_n, start_d, end_n, end_d = stack.pop()
+            if depth > radius:
+                continue
+            # Columns whose centres fall inside [start, end], ties rounded inward
+            min_c = (2 * depth * start_n + start_d) // (2 * start_d)
+            max_c = -((end_d - 2 * depth * end_n) // (2 * end_d))
+            base_r = row + depth_dr * depth
+            base_c = col + depth_dc * depth
+            prev = -1
+            for c in range(min_c, max_c + 1):
+                r = base_r + col_dr * c
+                cc = base_c + col_dc * c
+                inside = 0 <= r < height and 0 <= cc < width
+                floor = 1 if inside and transparent[r * width + cc] else 0
+                if inside and depth * depth + c * c <= limit:
+                    if not floor or (c * start_d >= depth * start_n and c * end_d <= depth * end_n):
+                        visible.add(r * width + cc)
+                if prev == 0 and floor:
+                    start_n = 2 * c - 1
+                    start_d = 2 * depth
+                elif prev == 1 and not floor:
+                    stack.append((depth + 1, start_n, start_d, 2 * c - 1, 2 * depth))
+                prev = floor
+            if prev == 1:
+                stack.append((depth + 1, start_n, start_d, end_n, end_d))
+    return array('i', sorted(visible))
+
+# Opt-in instrumentation for generate_map: wall-clock time per phase, named
+# counters, and hooks called as hook(event, phase, profile) with event 'start'
+# or 'end' around every phase (for example to switch a profiler on and off).
+class GenerationProfile:
+    def __init__(self):
+        self.timings = {}
+        self.counters = {}
+        self.hooks = []
+
+    def add_hook(self, hook):
+        self.hooks.append(hook)
+
+    def count(self, name, amount=1):
+        self.counters[name] = self.counters.get(name, 0) + amount
+
+    @contextmanager
+    def phase(self, name):
+        for hook in self.hooks:
+            hook('start', name, self)
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.timings[name] = self.timings.get(name, 0.0) + time.perf_counter() - start
+            for hook in self.hooks:
+                hook('end', name, self)
+
+    def total_time(self):
+        return sum(self.timings.values())
+
+    def report(self):
+        lines = []
+        for name, seconds in self.timings.items():
+            lines.append(f"{name:>20} {seconds * 1000:10.3f} ms")
+        lines.append(f"{'total':>20} {self.total_time() * 1000:10.3f} ms")
+        for name, value in self.counters.items():
+            lines.append(f"{name:>20} {value:10d}")
+        return '\n'.join(lines)
+
+def cprofile_hook(profiler):
+    # Hook that runs a cProfile.Profile only while generation phases execute
+    def hook(event, phase, profile):
+        if event == 'start':
+            profiler.enable()
+        else:
+            profiler.disable()
+    return hook
+
 class RLDungeonGenerator:
-    def __init__(self, w, h):
+    # rasterize=False plans geometry only: no tile grid is allocated until
+    # rasterize() is called (see generate_geometry).
+    def __init__(self, w, h, seed=None, rasterize=True):
         self.MAX = 15 # Cutoff for when we want to stop dividing sections
+        # seed may be an int (reproducible maps), a random.Random instance, or None
+        if isinstance(seed, Random):
+            self.seed = None
+            self.rng = seed
+        else:
+            self.seed = seed
+            self.rng = Random(seed)
         self.width = w
         self.height = h
         self.leaves = []
-        self.dungeon = []
         self.rooms = []
+        # (i, j) indexes into self.rooms for every corridor connect_rooms carved,
+        # and the matching Corridor records
+        self.room_links = []
+        self.corridors = []
+        self.init_player()
+        # Optional GenerationProfile; None keeps generate_map on the plain path
+        self.profile = None
+        self.revealed_rooms = bytearray()
+        self.explored_version = 0
+        self.init_fov()
+
+        self.tiles = None
+        self.dungeon = None
+        self.room_ids = None
+        self.explored = None
+        # (path, mmap) when tiles is a view of a memory-mapped save file
+        self.mapping = None
+        if rasterize:
+            self.allocate_grid()
+
+    def allocate_grid(self):
+        # One byte per tile, row-major. self.dungeon is a compatibility view over it.
+        self.tiles = bytearray([WALL]) * (self.width * self.height)
+        self.dungeon = DungeonGrid(self)
+
+        # Room index per tile (NO_ROOM outside rooms), filled in as rooms are carved
+        self.room_ids = array('i', [NO_ROOM]) * (self.width * self.height)
+        # Fog-of-war explored flags, one byte per tile (all unexplored initially),
+        # plus a flag per room so a room that has been revealed is skipped
+        self.explored = bytearray(self.width * self.height)
+
+    @classmethod
+    def from_tiles(cls, w, h, seed, tiles, rooms, explored=None):
+        # A map over existing tile bytes (a loaded save, which may be memory-mapped)
+        # with everything else set up by the constructor and room_ids rebuilt
+        dg = cls(w, h, seed, rasterize=False)
+        dg.tiles = tiles
+        dg.dungeon = DungeonGrid(dg)
+        dg.rooms = rooms
+        dg.index_rooms()
+        dg.explored = explored if explored is not None else bytearray(w * h)
+        return dg
+
+    def release_mapping(self):
+        # Move memory-mapped tiles into a bytearray and close the mapping, so
+        # the file can be replaced (Windows refuses while a mapping is open)
+        if self.mapping is None:
+            return
+        tiles = bytearray(self.tiles)
+        self.tiles.release()
+        self.mapping[1].close()
+        self.tiles = tiles
+        self.mapping = None
+
+    def init_player(self):
         self.player_row = 0
         self.player_col = 0
         self.tile_size = 16
@@ -45,72 +291,147 @@ class RLDungeonGenerator:
         self.player_radius = 6.0
         self.last_revealed_tile = (-1, -1)
 
-        for h in range(self.height):
-            row = []
-            for w in range(self.width):
-                row.append(DungeonSqr('#'))
-
-            self.dungeon.append(row)
-
-        # Fog-of-war explored grid (all unexplored initially)
-        self.explored = [[False for _ in range(self.width)] for _ in range(self.height)]
+    def init_fov(self):
+        # Shadowcasting field of view. fov_radius None keeps the classic reveal
+        # (whole rooms, a small disc in corridors). Opacity comes from a mask
+        # built once from the tiles, and each (tile, radius) field is cached so
+        # walking back over the same tiles never recomputes it.
+        self.fov_radius = None
+        self.fov_cache = OrderedDict()
+        self.fov_cache_size = FOV_CACHE_SIZE
+        self.transparent = None
+        # Currently visible tiles (one byte per tile) and their flat indexes
+        self.visible = None
+        self.visible_tiles = ()
 
     def random_split(self, min_row, min_col, max_row, max_col):
-        # We want to keep splitting until the sections get down to the threshold
+        # We want to keep splitting until the sections get down to the threshold.
+        # An explicit stack (right half pushed first) visits sections in the same
+        # order, drawing the same random numbers, as recursing would, without
+        # hitting the recursion limit on huge maps.
+        stack = [(min_row, min_col, max_row, max_col)]
+        while stack:
+            region = stack.pop()
+            halves = self.split_region(*region)
+            if halves is None:
+                self.leaves.append(region)
+            else:
+                stack.append(halves[1])
+                stack.append(halves[0])
+
+    def split_region(self, min_row, min_col, max_row, max_col):
+        # The two halves of a section, or None when it is already below the threshold
         seg_height = max_row - min_row
         seg_width = max_col - min_col
 
         if seg_height < self.MAX and seg_width < self.MAX:
-            self.leaves.append((min_row, min_col, max_row, max_col))
+            return None
         elif seg_height < self.MAX and seg_width >= self.MAX:
-            self.split_on_vertical(min_row, min_col, max_row, max_col)
+            return self.split_on_vertical(min_row, min_col, max_row, max_col)
         elif seg_height >= self.MAX and seg_width < self.MAX:
-            self.split_on_horizontal(min_row, min_col, max_row, max_col)
+            return self.split_on_horizontal(min_row, min_col, max_row, max_col)
+        elif self.rng.random() < 0.5:
+            return self.split_on_horizontal(min_row, min_col, max_row, max_col)
         else:
-                if random() < 0.5:
-                    self.split_on_horizontal(min_row, min_col, max_row, max_col)
-                else:
-                    self.split_on_vertical(min_row, min_col, max_row, max_col)
-     
+            return self.split_on_vertical(min_row, min_col, max_row, max_col)
+
     def split_on_horizontal(self, min_row, min_col, max_row, max_col):
-        split = (min_row + max_row) // 2 + choice((-2, -1, 0, 1, 2))
-        self.random_split(min_row, min_col, split, max_col)
-        self.random_split(split + 1, min_col, max_row, max_col)
+        split = (min_row + max_row) // 2 + self.rng.choice((-2, -1, 0, 1, 2))
+        return (min_row, min_col, split, max_col), (split + 1, min_col, max_row, max_col)
 
-    def split_on_vertical(self, min_row, min_col, max_row, max_col):        
-        split = (min_col + max_col) // 2 + choice((-2, -1, 0, 1, 2))
-        self.random_split(min_row, min_col, max_row, split)
-        self.random_split(min_row, split + 1, max_row, max_col)
+    def split_on_vertical(self, min_row, min_col, max_row, max_col):
+        split = (min_col + max_col) // 2 + self.rng.choice((-2, -1, 0, 1, 2))
+        return (min_row, min_col, max_row, split), (min_row, split + 1, max_row, max_col)
+
+    def split_top(self, depth):
+        # Sections left after `depth` levels of splitting the whole map, left to
+        # right. Each is an independent BSP subtree for generate_parallel_map.
+        regions = [(1, 1, self.height - 1, self.width - 1)]
+        for _ in range(depth):
+            next_regions = []
+            for region in regions:
+                halves = self.split_region(*region)
+                next_regions.extend(halves if halves is not None else (region,))
+            regions = next_regions
+        return regions
 
     def carve_rooms(self):
+        first = len(self.rooms)
+        self.place_rooms()
+        for i in range(first, len(self.rooms)):
+            self.fill_room(i)
+
+    def fill_room(self, i):
+        room = self.rooms[i]
+        self.fill_rect(room.row, room.col, room.height, room.width, FLOOR)
+        self.index_room(i)
+
+    def place_rooms(self):
+        # Geometry half of carve_rooms: choose a room rectangle in each leaf
+        # without touching the tile grid
         for leaf in self.leaves:
             # We don't want to fill in every possible room or the 
             # dungeon looks too uniform
-            if random() > 0.80: continue
+            if self.rng.random() > 0.80: continue
             section_width = leaf[3] - leaf[1]
             section_height = leaf[2] - leaf[0]
 
             # The actual room's height and width will be 60-100% of the 
             # available section. 
-            room_width = round(randrange(60, 100) / 100 * section_width)
-            room_height = round(randrange(60, 100) / 100 * section_height)
+            room_width = round(self.rng.randrange(60, 100) / 100 * section_width)
+            room_height = round(self.rng.randrange(60, 100) / 100 * section_height)
 
             # If the room doesn't occupy the entire section we are carving it from,
             # 'jiggle' it a bit in the square
             if section_height > room_height:
-                room_start_row = leaf[0] + randrange(section_height - room_height)
+                room_start_row = leaf[0] + self.rng.randrange(section_height - room_height)
             else:
                 room_start_row = leaf[0]
 
             if section_width > room_width:
-                room_start_col = leaf[1] + randrange(section_width - room_width)
+                room_start_col = leaf[1] + self.rng.randrange(section_width - room_width)
             else:
                 room_start_col = leaf[1]
     
             self.rooms.append(Room(room_start_row, room_start_col, room_height, room_width))
-            for r in range(room_start_row, room_start_row + room_height):
-                for c in range(room_start_col, room_start_col + room_width):
-                    self.dungeon[r][c] = DungeonSqr('.')
+
+    def index_room(self, i):
+        room = self.rooms[i]
+        if room.height > 0 and room.width > 0:
+            run = array('i', [i]) * room.width
+            start = room.row * self.width + room.col
+            for k in range(start, start + room.height * self.width, self.width):
+                self.room_ids[k:k + room.width] = run
+        if len(self.revealed_rooms) <= i:
+            self.revealed_rooms.extend(bytes(i + 1 - len(self.revealed_rooms)))
+
+    def index_rooms(self):
+        # Rebuild room_ids from self.rooms, for rooms that were not carved by carve_rooms
+        self.room_ids = array('i', [NO_ROOM]) * (self.width * self.height)
+        self.revealed_rooms = bytearray(len(self.rooms))
+        for i in range(len(self.rooms)):
+            self.index_room(i)
+
+    def room_at(self, r, c):
+        # Index into self.rooms of the room covering (r, c), or NO_ROOM
+        if r < 0 or c < 0 or r >= self.height or c >= self.width:
+            return NO_ROOM
+        return self.room_ids[r * self.width + c]
+
+    def fill_rect(self, row, col, height, width, code):
+        # Write a whole rectangle of tiles, one slice assignment per row
+        if height <= 0 or width <= 0:
+            return
+        run = bytes((code,)) * width
+        start = row * self.width + col
+        for i in range(start, start + height * self.width, self.width):
+            self.tiles[i:i + width] = run
+
+    def set_tile(self, r, c, code):
+        self.tiles[r * self.width + c] = code
+
+    def get_tile(self, r, c):
+        return self.tiles[r * self.width + c]
 
     def are_rooms_adjacent(self, room1, room2):
         adj_rows = []
@@ -132,41 +453,36 @@ class RLDungeonGenerator:
         return sqrt((centre1[0] - centre2[0]) ** 2 + (centre1[1] - centre2[1]) ** 2)
 
     def carve_corridor_between_rooms(self, room1, room2):
-        if room2[2] == 'rows':
-            row = choice(room2[1])
-            # Figure out which room is to the left of the other
-            if room1.col + room1.width < room2[0].col:
-                start_col = room1.col + room1.width
-                end_col = room2[0].col
-            else:
-                start_col = room2[0].col + room2[0].width
-                end_col = room1.col                
-            for c in range(start_col, end_col):
-                self.dungeon[row][c] = DungeonSqr('.')
-
-            if end_col - start_col >= 4:
-                self.dungeon[row][start_col] = DungeonSqr('+')
-                self.dungeon[row][end_col - 1] = DungeonSqr('+')
-            elif start_col == end_col - 1:
-                self.dungeon[row][start_col] = DungeonSqr('+')
-        else:
-            col = choice(room2[1])
-            # Figure out which room is above the other
-            if room1.row + room1.height < room2[0].row:
-                start_row = room1.row + room1.height
-                end_row = room2[0].row
-            else:
-                start_row = room2[0].row + room2[0].height
-                end_row = room1.row
+        # room2 is a (room, overlapping rows/cols, 'rows'/'cols', distance) entry
+        self.carve_corridor(room1, room2[0], room2[2], self.rng.choice(room2[1]))
+
+    def carve_corridor(self, room1, room2, kind, line):
+        # Returns the number of corridor tiles written
+        return self.draw_corridor(self.plan_corridor(room1, room2, kind, line))
 
-            for r in range(start_row, end_row):
-                self.dungeon[r][col] = DungeonSqr('.')
+    def plan_corridor(self, room1, room2, kind, line):
+        if kind == 'rows':
+            # Figure out which room is to the left of the other
+            if room1.col + room1.width < room2.col:
+                return Corridor(kind, line, room1.col + room1.width, room2.col)
+            return Corridor(kind, line, room2.col + room2.width, room1.col)
+        # Figure out which room is above the other
+        if room1.row + room1.height < room2.row:
+            return Corridor(kind, line, room1.row + room1.height, room2.row)
+        return Corridor(kind, line, room2.row + room2.height, room1.row)
 
-            if end_row - start_row >= 4:
-                self.dungeon[start_row][col] = DungeonSqr('+')
-                self.dungeon[end_row - 1][col] = DungeonSqr('+')
-            elif start_row == end_row - 1:
-                self.dungeon[start_row][col] = DungeonSqr('+')
+    def draw_corridor(self, corridor):
+        start = corridor.start
+        end = corridor.end
+        if corridor.kind == 'rows':
+            self.fill_rect(corridor.line, start, 1, end - start, FLOOR)
+        elif end > start:
+            # Strided slice walks straight down the column
+            first = start * self.width + corridor.line
+            self.tiles[first:end * self.width + corridor.line:self.width] = bytes((FLOOR,)) * (end - start)
+        for r, c in corridor.doors():
+            self.set_tile(r, c, DOOR)
+        return len(corridor)
 
     # Find two nearby rooms that are in difference groups, draw
     # a corridor between them and merge the groups
@@ -197,8 +513,10 @@ class RLDungeonGenerator:
 
         start_group += other_group
         groups.remove(other_group)
-        
-    def connect_rooms(self):
+
+    # Original all-pairs connection pass. Kept as a reference implementation
+    # for benchmarking against connect_rooms.
+    def connect_rooms_pairwise(self):
         # Build a dictionary containing an entry for each room. Each bucket will
         # hold a list of the adjacent rooms, weather they are adjacent along rows or 
         # columns and the distance between them.
@@ -223,18 +541,233 @@ class RLDungeonGenerator:
         while len(groups) > 1:
             self.find_closest_unconnect_groups(groups, room_dict)
 
+    def bucket_rooms(self):
+        # Spatial hash of rooms by top-left corner. Cells are bigger than any room,
+        # so two rooms sharing a row (or column) sit at most one cell apart.
+        cell = 1
+        for room in self.rooms:
+            cell = max(cell, room.height + 1, room.width + 1)
+        buckets = {}
+        for i, room in enumerate(self.rooms):
+            buckets.setdefault((room.row // cell, room.col // cell), []).append(i)
+        return buckets, cell
+
+    def find_adjacent_rooms_within(self, min_dist2, max_dist2, buckets, cell, sources=None):
+        # Every pair of rooms sharing at least one row (or, failing that, one
+        # column) whose squared centre distance lies in (min_dist2, max_dist2],
+        # looked up through bucket_rooms' grid, as (squared distance, i, j,
+        # first, last + 1, 'rows'/'cols').
+        #
+        # sources is a sequence of (i, first) pairs: edges are searched from
+        # room i to rooms j >= first only. The default, every room paired with
+        # the next index, lists each pair once.
+        rooms = self.rooms
+        if sources is None:
+            sources = zip(range(len(rooms)), range(1, len(rooms) + 1))
+        reach = (isqrt(max_dist2) + cell) // cell + 1
+        edges = []
+        for i, first in sources:
+            room = rooms[i]
+            brow = room.row // cell
+            bcol = room.col // cell
+            row_end = room.row + room.height
+            col_end = room.col + room.width
+            centre_row = room.row + room.height // 2
+            centre_col = room.col + room.width // 2
+
+            # Rooms sharing rows are within one bucket row, so scan sideways
+            for drow in (-1, 0, 1):
+                for dcol in range(-reach, reach + 1):
+                    for j in buckets.get((brow + drow, bcol + dcol), ()):
+                        if j < first: continue
+                        other = rooms[j]
+                        lo = max(room.row, other.row)
+                        hi = min(row_end, other.row + other.height)
+                        if lo >= hi: continue
+                        dr = centre_row - (other.row + other.height // 2)
+                        dc = centre_col - (other.col + other.width // 2)
+                        dist2 = dr * dr + dc * dc
+                        if min_dist2 < dist2 <= max_dist2:
+                            edges.append((dist2, i, j, lo, hi, 'rows'))
+
+            # Rooms sharing columns are within one bucket column, so scan up and down
+            for dcol in (-1, 0, 1):
+                for drow in range(-reach, reach + 1):
+                    for j in buckets.get((brow + drow, bcol + dcol), ()):
+                        if j < first: continue
+                        other = rooms[j]
+                        lo = max(room.col, other.col)
+                        hi = min(col_end, other.col + other.width)
+                        if lo >= hi: continue
+                        # Row adjacency takes precedence, as in are_rooms_adjacent
+                        if room.row < other.row + other.height and other.row < row_end: continue
+                        dr = centre_row - (other.row + other.height // 2)
+                        dc = centre_col - (other.col + other.width // 2)
+                        dist2 = dr * dr + dc * dc
+                        if min_dist2 < dist2 <= max_dist2:
+                            edges.append((dist2, i, j, lo, hi, 'cols'))
+        return edges
+
+    def connect_rooms(self):
+        first = len(self.corridors)
+        self.plan_corridors()
+        if self.profile is None:
+            for corridor in self.corridors[first:]:
+                self.draw_corridor(corridor)
+        else:
+            self.profile.count('tiles_written', sum(self.draw_corridor(corridor) for corridor in self.corridors[first:]))
+
+    def plan_corridors(self, max_length=None, groups=None, regions=None):
+        # Geometry half of connect_rooms. Kruskal over the adjacency edges:
+        # repeatedly take the shortest corridor joining two different groups,
+        # tracking groups with a union-find. Corridors are recorded in
+        # self.corridors, not carved. Returns False, stopping early, as soon
+        # as a corridor longer than max_length is needed.
+        #
+        # With groups (a subtree number per room, non-decreasing over
+        # self.rooms, rooms of a subtree already connected) and the subtrees'
+        # regions, only corridors between subtrees are planned, searching from
+        # rooms near a shared border to rooms of later subtrees.
+        #
+        # Edges are produced in distance bands that double in radius until every
+        # room is connected. Bands are processed in order, so the result is the
+        # same as sorting every edge up front, but large maps never materialize
+        # the long-range pairs that Kruskal would skip anyway.
+        buckets, cell = self.bucket_rooms()
+        profile = self.profile
+        planned = len(self.corridors)
+        parent = list(range(len(self.rooms)))
+        merges_left = len(self.rooms) - 1
+        if groups is not None:
+            if any(a > b for a, b in zip(groups, groups[1:])):
+                raise ValueError("groups must be non-decreasing over the rooms")
+            first = {}
+            # Index just past each group's rooms
+            ends = {}
+            for i, group in enumerate(groups):
+                parent[i] = first.setdefault(group, i)
+                ends[group] = i + 1
+            merges_left = len(first) - 1
+        max_dist2 = self.width * self.width + self.height * self.height
+        band_lo = -1
+        band_hi = 4 * cell * cell
+        complete = True
+
+        while merges_left > 0:
+            if groups is None:
+                edges = self.find_adjacent_rooms_within(band_lo, band_hi, buckets, cell)
+            else:
+                sources = [(i, ends[groups[i]]) for i in self.rooms_near_borders(groups, regions, band_hi)]
+                edges = self.find_adjacent_rooms_within(band_lo, band_hi, buckets, cell, sources)
+            edges.sort()
+            for _, i, j, lo, hi, kind in edges:
+                root_i = find_root(parent, i)
+                root_j = find_root(parent, j)
+                if root_i == root_j:
+                    continue
+                parent[root_j] = root_i
+                merges_left -= 1
+                corridor = self.plan_corridor(self.rooms[i], self.rooms[j], kind, self.rng.randrange(lo, hi))
+                self.corridors.append(corridor)
+                self.room_links.append((i, j))
+                if max_length is not None and len(corridor) > max_length:
+                    complete = False
+                    break
+                if merges_left == 0:
+                    break
+            if profile is not None:
+                # Edges examined: the whole band, or up to the merge it stopped at
+                examined = len(edges)
+                if merges_left == 0 or not complete:
+                    examined = 1 + next(k for k, edge in enumerate(edges) if edge[1] == i and edge[2] == j)
+                profile.count('adjacency_pairs', len(edges))
+                profile.count('merge_iterations', examined)
+            if band_hi >= max_dist2 or not complete:
+                break
+            band_lo = band_hi
+            band_hi *= 4
+
+        if profile is not None:
+            profile.count('corridors', len(self.corridors) - planned)
+        return complete
+
     def generate_map(self):
+        if self.profile is not None:
+            self._generate_map_profiled()
+            return
         self.random_split(1, 1, self.height - 1, self.width - 1)
         self.carve_rooms()
         self.connect_rooms()
         self.spawn_player()
         self.reveal_current_area()
 
+    def rooms_near_borders(self, groups, regions, max_dist2):
+        # Rooms whose centre lies within sqrt(max_dist2) of a side its region
+        # shares with another region. A corridor to another region that short
+        # can only start from one of these.
+        reach = isqrt(max_dist2) + 1
+        near = []
+        for i, room in enumerate(self.rooms):
+            min_row, min_col, max_row, max_col = regions[groups[i]]
+            centre_row = room.row + room.height // 2
+            centre_col = room.col + room.width // 2
+            if ((min_row > 1 and centre_row - min_row <= reach) or
+                    (max_row < self.height - 1 and max_row - centre_row <= reach) or
+                    (min_col > 1 and centre_col - min_col <= reach) or
+                    (max_col < self.width - 1 and max_col - centre_col <= reach)):
+                near.append(i)
+        return near
+
+    def generate_geometry(self, min_rooms=0, max_corridor=None):
+        # Plan leaves, rooms and corridors without writing tiles. Returns False
+        # as soon as the layout breaks a constraint (fewer than min_rooms rooms,
+        # a corridor longer than max_corridor) so a caller can move on to the
+        # next seed before paying for the grid. RNG use matches generate_map,
+        # so rasterize() afterwards gives the same map.
+        self.random_split(1, 1, self.height - 1, self.width - 1)
+        self.place_rooms()
+        if len(self.rooms) < min_rooms:
+            return False
+        return self.plan_corridors(max_corridor)
+
+    def rasterize(self):
+        # Write planned rooms and corridors into a fresh tile grid and place the player
+        self.allocate_grid()
+        self.revealed_rooms = bytearray()
+        self.invalidate_fov()
+        for i in range(len(self.rooms)):
+            self.fill_room(i)
+        for corridor in self.corridors:
+            self.draw_corridor(corridor)
+        self.spawn_player()
+        self.reveal_current_area()
+
+    def enable_profiling(self, profile=None):
+        # Opt in to phase timings and counters for generate_map. Returns the
+        # GenerationProfile so callers can attach hooks or read results.
+        self.profile = profile if profile is not None else GenerationProfile()
+        return self.profile
+
+    def _generate_map_profiled(self):
+        profile = self.profile
+        with profile.phase('random_split'):
+            self.random_split(1, 1, self.height - 1, self.width - 1)
+        profile.count('leaves', len(self.leaves))
+        with profile.phase('carve_rooms'):
+            self.carve_rooms()
+        profile.count('rooms_carved', len(self.rooms))
+        profile.count('tiles_written', sum(room.height * room.width for room in self.rooms))
+        with profile.phase('connect_rooms'):
+            self.connect_rooms()
+        with profile.phase('spawn_player'):
+            self.spawn_player()
+        with profile.phase('reveal_current_area'):
+            self.reveal_current_area()
+
     def is_walkable(self, r, c):
         if r < 0 or c < 0 or r >= self.height or c >= self.width:
             return False
-        ch = self.dungeon[r][c].get_ch()
-        return ch in ('.', '+')
+        return self.tiles[r * self.width + c] in WALKABLE
 
     def spawn_player(self):
         # Prefer the center of the first room if available, otherwise first walkable tile
@@ -303,203 +836,749 @@ class RLDungeonGenerator:
         return True
 
     def reveal_current_area(self):
+        if self.fov_radius is not None:
+            self.reveal_fov()
+            return
         # Reveal the entire room when inside one; otherwise reveal a small radius (corridor)
-        current_room = None
-        for room in self.rooms:
-            if (self.player_row >= room.row and self.player_row < room.row + room.height and
-                self.player_col >= room.col and self.player_col < room.col + room.width):
-                current_room = room
-                break
+        room_id = self.room_at(self.player_row, self.player_col)
 
-        if current_room is not None:
+        if room_id != NO_ROOM:
+            if self.revealed_rooms[room_id]:
+                return
+            self.revealed_rooms[room_id] = 1
+            current_room = self.rooms[room_id]
             # Reveal the room AND a one-tile wall border around it so doors are visible
             r0 = max(0, current_room.row - 1)
             c0 = max(0, current_room.col - 1)
             r1 = min(self.height, current_room.row + current_room.height + 1)
             c1 = min(self.width, current_room.col + current_room.width + 1)
-            for r in range(r0, r1):
-                for c in range(c0, c1):
-                    self.explored[r][c] = True
+            self.reveal_rect(r0, c0, r1, c1)
         else:
-            radius = 2
-            rr = self.player_row
-            cc = self.player_col
-            for dr in range(-radius, radius + 1):
-                for dc in range(-radius, radius + 1):
-                    r = rr + dr
-                    c = cc + dc
-                    if 0 <= r < self.height and 0 <= c < self.width:
-                        if dr*dr + dc*dc <= radius*radius:
-                            self.explored[r][c] = True
+            self.reveal_disc(2)
+
+    def reveal_disc(self, radius):
+        # Reveal a disc around the player, one reveal_rect per row (corridors)
+        rr = self.player_row
+        cc = self.player_col
+        for dr in range(-radius, radius + 1):
+            span = isqrt(radius * radius - dr * dr)
+            self.reveal_rect(rr + dr, cc - span, rr + dr + 1, cc + span + 1)
+
+    def reveal_rect(self, r0, c0, r1, c1):
+        # Mark [r0, r1) x [c0, c1) explored, clipped to the map, one slice per row
+        r0 = max(0, r0)
+        c0 = max(0, c0)
+        r1 = min(self.height, r1)
+        c1 = min(self.width, c1)
+        if r0 >= r1 or c0 >= c1:
+            return
+        run = b'\x01' * (c1 - c0)
+        for i in range(r0 * self.width, r1 * self.width, self.width):
+            self.explored[i + c0:i + c1] = run
+        # Lets renderers tell cheaply whether the fog changed since the last frame
+        self.explored_version += 1
+
+    def is_explored(self, r, c):
+        return self.explored[r * self.width + c] != 0
+
+    def set_fov(self, radius):
+        # Switch to shadowcasting with the given radius (None goes back to the
+        # room reveal) and refresh what the player sees from where they stand
+        self.fov_radius = radius
+        self.last_revealed_tile = (self.player_row, self.player_col)
+        self.reveal_current_area()
+
+    def invalidate_fov(self):
+        # Call after tiles change so opacity is rebuilt and stale fields dropped
+        self.transparent = None
+        self.fov_cache.clear()
+
+    def field_of_view(self, row, col, radius):
+        # Flat indexes visible from (row, col), from the LRU cache when possible
+        key = (row * self.width + col, radius)
+        seen = self.fov_cache.get(key)
+        if seen is not None:
+            self.fov_cache.move_to_end(key)
+            return seen
+        if self.transparent is None:
+            self.transparent = bytes(self.tiles).translate(TRANSPARENT_TABLE)
+        seen = shadowcast(self.transparent, self.width, self.height, row, col, radius)
+        self.fov_cache[key] = seen
+        while len(self.fov_cache) > self.fov_cache_size:
+            self.fov_cache.popitem(last=False)
+        return seen
+
+    def reveal_fov(self):
+        # Replace the visible set with the player's field of view and add it to explored
+        seen = self.field_of_view(self.player_row, self.player_col, self.fov_radius)
+        if self.visible is None:
+            self.visible = bytearray(self.width * self.height)
+        visible = self.visible
+        explored = self.explored
+        for i in self.visible_tiles:
+            visible[i] = 0
+        for i in seen:
+            visible[i] = 1
+            explored[i] = 1
+        self.visible_tiles = seen
+        self.explored_version += 1
+
+    def is_visible(self, r, c):
+        return self.visible is not None and self.visible[r * self.width + c] != 0
+
+    def viewport(self, row, col, height, width):
+        # (tiles, explored) as row-major bytes for the height x width window at (row, col)
+        first = row * self.width + col
+        last = (row + height) * self.width + col
+        tiles = b''.join(self.tiles[i:i + width] for i in range(first, last, self.width))
+        explored = b''.join(self.explored[i:i + width] for i in range(first, last, self.width))
+        return tiles, explored
+
+    def walkable_mask(self):
+        # One byte per tile, 1 where walkable, built with a single C-level translate
+        return bytes(self.tiles).translate(WALKABLE_TABLE)
+
+    def door_positions(self):
+        # (row, col) of every door tile, found with C-level byte searches
+        tiles = bytes(self.tiles)
+        doors = []
+        i = tiles.find(DOOR)
+        while i != -1:
+            doors.append(divmod(i, self.width))
+            i = tiles.find(DOOR, i + 1)
+        return doors
+
+    def map_rows(self):
+        for i in range(0, self.width * self.height, self.width):
+            yield bytes(self.tiles[i:i + self.width]).decode('ascii')
 
     def print_map(self):
-        for r in range(self.height):
-            row = ''
-            for c in range(self.width):
-                row += self.dungeon[r][c].get_ch()
-            print(row)
+        print('\n'.join(self.map_rows()))
 
 
-def render_with_tcod(dg: RLDungeonGenerator) -> None:
-    if tcod is None:
-        print("tcod is not installed. Install requirements and try again.")
-        sys.exit(1)
+# A dungeon of unbounded size, carved lazily one fixed-size chunk at a time.
+#
+# Each chunk is an ordinary RLDungeonGenerator map whose seed is derived from the
+# world seed and the chunk's coordinates, so a chunk can be dropped from the LRU
+# cache and rebuilt identically later. Neighbouring chunks agree on a portal tile
+# on their shared edge (again derived from the world seed), and each side carves
+# a corridor from the portal to its nearest room, so corridors line up across
+# chunk borders without either chunk knowing about the other's rooms.
+#
+# Explored flags are kept per visited chunk outside the cache, so fog of war
+# survives eviction.
+#
+# Smallest chunk with room for a room inside its wall border and for portal
+# tiles that are not on a corner (see portal_offset)
+MIN_CHUNK_SIZE = 5
 
-    # Prefer a project-local bitmap tileset first
-    tileset = None
-    png_tileset_path = os.path.join(os.path.dirname(__file__), 'assets', 'tilesets', 'Redjack17.png')
-    if os.path.exists(png_tileset_path):
-        try:
-            # Assumes CP437 16x16 grid tilesheet
-            tileset = tcod.tileset.load_tilesheet(png_tileset_path, 16, 16, tcod.tileset.CHARMAP_CP437)
-        except Exception:
-            tileset = None
-
-    # If PNG load failed, attempt to load a TrueType font from system Consolas
-    if tileset is None:
-        default_ttf_paths = [
-            os.path.join(os.environ.get('WINDIR', 'C:\\Windows'), 'Fonts', 'consola.ttf'),
-            os.path.join(os.environ.get('WINDIR', 'C:\\Windows'), 'Fonts', 'consolab.ttf'),
-        ]
-
-        for path in default_ttf_paths:
-            if os.path.exists(path):
-                try:
-                    tileset = tcod.tileset.load_truetype_font(path, 16, tcod.tileset.CHARMAP_CP437)
-                    break
-                except Exception:
+class ChunkedDungeon(RLDungeonGenerator):
+    def __init__(self, seed=None, chunk_size=64, max_chunks=64, chunks_w=1 << 16, chunks_h=1 << 16):
+        if chunk_size < MIN_CHUNK_SIZE:
+            raise ValueError(f"chunk_size must be at least {MIN_CHUNK_SIZE}")
+        if seed is None:
+            seed = Random().randrange(2 ** 32)
+        # No world-sized grid: tiles live in the chunks, built on demand
+        RLDungeonGenerator.__init__(self, chunks_w * chunk_size, chunks_h * chunk_size, seed, rasterize=False)
+        self.chunk_size = chunk_size
+        self.max_chunks = max_chunks
+        self.chunks_w = chunks_w
+        self.chunks_h = chunks_h
+        self.chunks = OrderedDict()
+        self.explored_chunks = {}
+        # Revealed rooms are keyed by (cx, cy, room index) rather than flagged per room
+        self.revealed_rooms = set()
+
+    def chunk_seed(self, cx, cy):
+        return derive_seed(self.seed, 'chunk', cx, cy)
+
+    def portal_offset(self, kind, cx, cy):
+        # Position along the edge shared by chunk (cx, cy) and its east ('h')
+        # or south ('v') neighbour. Both chunks derive the same value.
+        span = self.chunk_size - 4
+        return 2 + derive_seed(self.seed, kind, cx, cy) % span
+
+    def get_chunk(self, cx, cy):
+        key = (cx, cy)
+        chunk = self.chunks.get(key)
+        if chunk is not None:
+            self.chunks.move_to_end(key)
+            return chunk
+        chunk = self.build_chunk(cx, cy)
+        self.chunks[key] = chunk
+        while len(self.chunks) > self.max_chunks:
+            self.chunks.popitem(last=False)
+        return chunk
+
+    def build_chunk(self, cx, cy):
+        size = self.chunk_size
+        chunk = RLDungeonGenerator(size, size, self.chunk_seed(cx, cy))
+        chunk.random_split(1, 1, size - 1, size - 1)
+        chunk.carve_rooms()
+        chunk.connect_rooms()
+
+        if cx + 1 < self.chunks_w:
+            self.carve_portal(chunk, self.portal_offset('h', cx, cy), size - 1)
+        if cx > 0:
+            self.carve_portal(chunk, self.portal_offset('h', cx - 1, cy), 0)
+        if cy + 1 < self.chunks_h:
+            self.carve_portal(chunk, size - 1, self.portal_offset('v', cx, cy))
+        if cy > 0:
+            self.carve_portal(chunk, 0, self.portal_offset('v', cx, cy - 1))
+        return chunk
+
+    def carve_portal(self, chunk, row, col):
+        # L-shaped corridor from the edge tile (row, col) to the centre of the
+        # nearest room: first along the edge's axis, then across.
+        target_row = target_col = chunk.width // 2
+        best = None
+        for room in chunk.rooms:
+            centre_row = room.row + room.height // 2
+            centre_col = room.col + room.width // 2
+            dist2 = (centre_row - row) ** 2 + (centre_col - col) ** 2
+            if best is None or dist2 < best:
+                best = dist2
+                target_row = centre_row
+                target_col = centre_col
+
+        if col == 0 or col == chunk.width - 1:
+            chunk.fill_rect(row, min(col, target_col), 1, abs(target_col - col) + 1, FLOOR)
+            chunk.fill_rect(min(row, target_row), target_col, abs(target_row - row) + 1, 1, FLOOR)
+        else:
+            chunk.fill_rect(min(row, target_row), col, abs(target_row - row) + 1, 1, FLOOR)
+            chunk.fill_rect(target_row, min(col, target_col), 1, abs(target_col - col) + 1, FLOOR)
+
+    def chunk_explored(self, cx, cy):
+        explored = self.explored_chunks.get((cx, cy))
+        if explored is None:
+            explored = bytearray(self.chunk_size * self.chunk_size)
+            self.explored_chunks[(cx, cy)] = explored
+        return explored
+
+    def generate_map(self):
+        # Nothing is carved up front; start in the middle chunk of the world
+        self.spawn_player()
+        self.reveal_current_area()
+
+    def spawn_player(self):
+        cx = self.chunks_w // 2
+        cy = self.chunks_h // 2
+        chunk = self.get_chunk(cx, cy)
+        base_row = cy * self.chunk_size
+        base_col = cx * self.chunk_size
+        if chunk.rooms:
+            room = chunk.rooms[0]
+            self.set_player_position(base_row + room.row + room.height // 2, base_col + room.col + room.width // 2)
+            return
+        for i, code in enumerate(chunk.tiles):
+            if code in WALKABLE:
+                r, c = divmod(i, self.chunk_size)
+                self.set_player_position(base_row + r, base_col + c)
+                return
+
+    def get_tile(self, r, c):
+        size = self.chunk_size
+        chunk = self.get_chunk(c // size, r // size)
+        return chunk.tiles[(r % size) * size + c % size]
+
+    def is_walkable(self, r, c):
+        if r < 0 or c < 0 or r >= self.height or c >= self.width:
+            return False
+        return self.get_tile(r, c) in WALKABLE
+
+    def room_at(self, r, c):
+        # (chunk x, chunk y, room index in that chunk), or NO_ROOM
+        if r < 0 or c < 0 or r >= self.height or c >= self.width:
+            return NO_ROOM
+        size = self.chunk_size
+        cx = c // size
+        cy = r // size
+        room_id = self.get_chunk(cx, cy).room_at(r % size, c % size)
+        return NO_ROOM if room_id == NO_ROOM else (cx, cy, room_id)
+
+    def reveal_current_area(self):
+        room_key = self.room_at(self.player_row, self.player_col)
+        if room_key != NO_ROOM:
+            if room_key in self.revealed_rooms:
+                return
+            self.revealed_rooms.add(room_key)
+            cx, cy, room_id = room_key
+            room = self.get_chunk(cx, cy).rooms[room_id]
+            row = cy * self.chunk_size + room.row
+            col = cx * self.chunk_size + room.col
+            # Rooms never touch the chunk edge, so the border stays inside the chunk
+            self.reveal_rect(row - 1, col - 1, row + room.height + 1, col + room.width + 1)
+        else:
+            self.reveal_disc(2)
+
+    def reveal_rect(self, r0, c0, r1, c1):
+        r0 = max(0, r0)
+        c0 = max(0, c0)
+        r1 = min(self.height, r1)
+        c1 = min(self.width, c1)
+        size = self.chunk_size
+        for cy in range(r0 // size, (r1 - 1) // size + 1):
+            for cx in range(c0 // size, (c1 - 1) // size + 1):
+                explored = self.chunk_explored(cx, cy)
+                lr0 = max(r0, cy * size) - cy * size
+                lr1 = min(r1, (cy + 1) * size) - cy * size
+                lc0 = max(c0, cx * size) - cx * size
+                lc1 = min(c1, (cx + 1) * size) - cx * size
+                if lr0 >= lr1 or lc0 >= lc1:
                     continue
+                run = b'\x01' * (lc1 - lc0)
+                for i in range(lr0 * size, lr1 * size, size):
+                    explored[i + lc0:i + lc1] = run
+        self.explored_version += 1
 
-    if tileset is None:
-        print("Could not load a TrueType font from system. Falling back to ASCII output. Run with --ascii to skip this attempt.")
-        dg.print_map()
+    def is_explored(self, r, c):
+        size = self.chunk_size
+        explored = self.explored_chunks.get((c // size, r // size))
+        return explored is not None and explored[(r % size) * size + c % size] != 0
+
+    def viewport(self, row, col, height, width):
+        # Assemble the window from the chunks it overlaps, carving them on demand
+        size = self.chunk_size
+        tiles = bytearray(height * width)
+        explored = bytearray(height * width)
+        for cy in range(row // size, (row + height - 1) // size + 1):
+            for cx in range(col // size, (col + width - 1) // size + 1):
+                chunk = self.get_chunk(cx, cy)
+                chunk_explored = self.explored_chunks.get((cx, cy))
+                r0 = max(row, cy * size)
+                r1 = min(row + height, (cy + 1) * size)
+                c0 = max(col, cx * size)
+                c1 = min(col + width, (cx + 1) * size)
+                lc0 = c0 - cx * size
+                lc1 = c1 - cx * size
+                for r in range(r0, r1):
+                    src = (r - cy * size) * size
+                    dst = (r - row) * width + (c0 - col)
+                    tiles[dst:dst + c1 - c0] = chunk.tiles[src + lc0:src + lc1]
+                    if chunk_explored is not None:
+                        explored[dst:dst + c1 - c0] = chunk_explored[src + lc0:src + lc1]
+        return bytes(tiles), bytes(explored)
+
+    def map_rows(self, height=40, width=75):
+        # Rows of the window centred on the player; the world itself has no end
+        row = max(0, min(self.height - height, self.player_row - height // 2))
+        col = max(0, min(self.width - width, self.player_col - width // 2))
+        tiles, _ = self.viewport(row, col, height, width)
+        for i in range(0, height * width, width):
+            yield tiles[i:i + width].decode('ascii')
+
+    def print_map(self, height=40, width=75):
+        print('\n'.join(self.map_rows(height, width)))
+
+
+def render_with_tcod(dg, levels=None, stats=None, max_frames=None):
+    # The window lives in dungeon_render, imported (with tcod and NumPy) only
+    # when a window is actually opened so --ascii and batch runs start fast
+    from dungeon_render import render_with_tcod
+    return render_with_tcod(dg, levels, stats, max_frames)
+
+
+def generate_seeded_map(width, height, seed):
+    dg = RLDungeonGenerator(width, height, seed)
+    dg.generate_map()
+    return dg
+
+
+def generate_seeded_layout(width, height, seed):
+    # Geometry only (leaves, rooms, corridors); no tile grid
+    dg = RLDungeonGenerator(width, height, seed, rasterize=False)
+    dg.generate_geometry()
+    return dg
+
+
+def generate_constrained_map(width, height, seeds, min_rooms=0, max_corridor=None):
+    # The first seed whose layout has at least min_rooms rooms and no corridor
+    # longer than max_corridor, rasterized, or None if no seed qualifies.
+    # Rejected layouts never allocate or carve a tile grid.
+    for seed in seeds:
+        dg = RLDungeonGenerator(width, height, seed, rasterize=False)
+        if dg.generate_geometry(min_rooms, max_corridor):
+            dg.rasterize()
+            return dg
+    return None
+
+
+def plan_subtree(width, height, region, seed):
+    # Rooms and corridors of one BSP subtree, in map coordinates, as plain tuples
+    dg = RLDungeonGenerator(width, height, seed, rasterize=False)
+    dg.random_split(*region)
+    dg.place_rooms()
+    dg.plan_corridors()
+    rooms = [(room.row, room.col, room.height, room.width) for room in dg.rooms]
+    corridors = [(c.kind, c.line, c.start, c.end) for c in dg.corridors]
+    return dg.leaves, rooms, corridors, dg.room_links
+
+
+def generate_parallel_map(width, height, seed=None, split_depth=3, workers=None):
+    # One map built from up to 2 ** split_depth BSP subtrees planned in
+    # parallel. The top splits are made here; each subtree is split, filled
+    # with rooms and connected in a worker with a seed derived from its
+    # position, and a final pass connects the subtrees to each other before
+    # the whole map is rasterized. The result depends only on the seed, not
+    # on the number of workers (it differs from generate_map's map).
+    if seed is None:
+        seed = Random().randrange(2 ** 32)
+    dg = RLDungeonGenerator(width, height, seed, rasterize=False)
+    regions = dg.split_top(split_depth)
+    jobs = [(width, height, region, derive_seed(seed, 'subtree', k)) for k, region in enumerate(regions)]
+
+    if workers == 1 or len(jobs) == 1:
+        results = [plan_subtree(*job) for job in jobs]
+    else:
+        from concurrent.futures import ProcessPoolExecutor
+        with ProcessPoolExecutor(min(len(jobs), workers or os.cpu_count() or 1)) as pool:
+            results = list(pool.map(plan_subtree, *zip(*jobs)))
+
+    groups = []
+    for k, (leaves, rooms, corridors, links) in enumerate(results):
+        offset = len(dg.rooms)
+        dg.leaves.extend(leaves)
+        dg.rooms.extend(Room(*room) for room in rooms)
+        dg.corridors.extend(Corridor(*corridor) for corridor in corridors)
+        dg.room_links.extend((i + offset, j + offset) for i, j in links)
+        groups.extend([k] * len(rooms))
+
+    dg.plan_corridors(groups=groups, regions=regions)
+    dg.rasterize()
+    return dg
+
+
+def dungeon_from_geometry(record):
+    # Rebuild and rasterize a map from a geometry record (see dungeon_export.geometry_record)
+    dg = RLDungeonGenerator(record['width'], record['height'], record['seed'], rasterize=False)
+    dg.rooms = [Room(*room) for room in record['rooms']]
+    dg.corridors = [Corridor(*corridor) for corridor in record['corridors']]
+    dg.room_links = [tuple(link) for link in record['links']]
+    dg.rasterize()
+    return dg
+
+
+def generate_batch(seeds, width, height, workers=None, geometry_only=False):
+    # Generate one map per seed, fanned out over a process pool, yielding the
+    # finished maps in seed order. Only a bounded window of maps is in flight
+    # so huge batches stream instead of piling up in memory. With
+    # geometry_only the maps are layouts that have not been rasterized.
+    generate = generate_seeded_layout if geometry_only else generate_seeded_map
+    if workers == 1:
+        for seed in seeds:
+            yield generate(width, height, seed)
         return
 
-    # Viewport size (camera window). Smaller than full map = zoomed-in view.
-    view_w = min(40, dg.width)
-    view_h = min(25, dg.height)
-    console = tcod.console.Console(view_w, view_h, order="F")
-    movement_key_map = {
-        tcod.event.K_UP: (0.0, -1.0),
-        tcod.event.K_w: (0.0, -1.0),
-        tcod.event.K_KP_8: (0.0, -1.0),
-        tcod.event.K_DOWN: (0.0, 1.0),
-        tcod.event.K_s: (0.0, 1.0),
-        tcod.event.K_KP_2: (0.0, 1.0),
-        tcod.event.K_LEFT: (-1.0, 0.0),
-        tcod.event.K_a: (-1.0, 0.0),
-        tcod.event.K_KP_4: (-1.0, 0.0),
-        tcod.event.K_RIGHT: (1.0, 0.0),
-        tcod.event.K_d: (1.0, 0.0),
-        tcod.event.K_KP_6: (1.0, 0.0),
-    }
-    held_directions = []
-
-    with tcod.context.new(
-        columns=view_w,
-        rows=view_h,
-        tileset=tileset,
-        title="RLDungeonGenerator",
-        vsync=True,
-    ) as context:
-        last_frame_time = time.time()
-        
+    workers = workers or os.cpu_count() or 1
+    # Imported on first use: pulling in multiprocessing is a large share of
+    # the script's startup time and single-map runs never need it
+    from concurrent.futures import ProcessPoolExecutor
+    with ProcessPoolExecutor(workers) as pool:
+        window = workers * 4
+        pending = deque()
+        for seed in seeds:
+            pending.append(pool.submit(generate, width, height, seed))
+            if len(pending) >= window:
+                yield pending.popleft().result()
+        while pending:
+            yield pending.popleft().result()
+
+
+def generate_level(width, height, seed, fov_radius=None, params=None):
+    # params picks the generation mode the command line would: cache_dir (reuse
+    # cached maps), split_depth (subtrees planned serially here, which gives the
+    # same map as a pool without one per level) or min_rooms/max_corridor
+    # (consecutive seeds from seed, up to attempts of them). Plain otherwise.
+    params = params or {}
+    if params.get('cache_dir'):
+        dg = cached_map(params['cache_dir'], width, height, seed)
+    elif params.get('split_depth'):
+        dg = generate_parallel_map(width, height, seed, params['split_depth'], workers=1)
+    elif params.get('min_rooms') or params.get('max_corridor') is not None:
+        attempts = params.get('attempts', 1000)
+        seeds = [(seed + k) % SEED_LIMIT for k in range(attempts)]
+        dg = generate_constrained_map(width, height, seeds, params.get('min_rooms', 0), params.get('max_corridor'))
+        if dg is None:
+            raise ValueError(f"no layout in {attempts} seeds from {seed} meets the constraints")
+    else:
+        dg = generate_seeded_map(width, height, seed)
+    if fov_radius is not None:
+        dg.set_fov(fov_radius)
+    return dg
+
+
+# Chain of levels where the next ones are generated in the background while the
+# current one is played.
+#
+# Level n's seed is derived from the base seed, so a chain replays identically.
+# Up to `lookahead` levels past the current one are kept prepared (or in
+# progress); levels outside that window are cancelled or dropped, which bounds
+# memory. With the default thread worker, the finished RLDungeonGenerator is
+# handed over as-is with no copy. A 'process' worker keeps generation off the
+# game loop's interpreter entirely, at the cost of pickling the map back.
+# params (see generate_level) keeps every level in the same generation mode.
+# Levels run one at a time on a daemon thread, so quitting never waits for a
+# level still being generated; close() also terminates the 'process' worker.
+#
+#   levels = LevelManager(75, 40, seed=42)
+#   dg = levels.current()             # level 0, generated now
+#   ...
+#   dg = levels.advance()             # level 1, usually already waiting
+class LevelManager:
+    def __init__(self, width, height, seed=None, lookahead=1, worker='thread', fov_radius=None, first=None,
+                 params=None):
+        if worker not in ('thread', 'process'):
+            raise ValueError(f"unknown level worker {worker!r}")
+        self.width = width
+        self.height = height
+        self.seed = seed if seed is not None else Random().randrange(2 ** 32)
+        self.lookahead = lookahead
+        self.fov_radius = fov_radius
+        self.params = params
+        # Imported here, like the executors elsewhere, to keep startup fast
+        from queue import SimpleQueue
+        from threading import Thread
+        self.processes = None
+        if worker == 'process':
+            from multiprocessing import Pool
+            self.processes = Pool(1)
+        self.queue = SimpleQueue()
+        Thread(target=self._work, daemon=True).start()
+        self.pending = OrderedDict()
+        self.level = 0
+        # An already built map (loaded, cached...) can stand in for level 0
+        self.dg = first
+        self.prefetch()
+
+    def _work(self):
+        # Worker thread: run queued levels in order, skipping cancelled ones
         while True:
-            current_time = time.time()
-            delta_time = current_time - last_frame_time
-            last_frame_time = current_time
-            # Cap delta_time to prevent large jumps
-            if delta_time > 0.1:
-                delta_time = 0.1
-            
-            # Determine desired movement direction from input
-            input_dx = 0.0
-            input_dy = 0.0
-            for direction in held_directions:
-                input_dx += direction[0]
-                input_dy += direction[1]
-            dg.update_movement(delta_time, (input_dx, input_dy))
-            
-            # Draw current dungeon
-            console.clear()
-            # Camera uses logical tile position (not visual) to prevent jiggling
-            # This keeps the map stable while only the player moves smoothly
-            cam_y = int(dg.player_y / dg.tile_size) - view_h // 2
-            cam_x = int(dg.player_x / dg.tile_size) - view_w // 2
-            if cam_y < 0: cam_y = 0
-            if cam_x < 0: cam_x = 0
-            if cam_y > dg.height - view_h: cam_y = dg.height - view_h
-            if cam_x > dg.width - view_w: cam_x = dg.width - view_w
-
-            for r in range(view_h):
-                wr = cam_y + r
-                for c in range(view_w):
-                    wc = cam_x + c
-                    if wr < 0 or wr >= dg.height or wc < 0 or wc >= dg.width:
-                        continue
-                    ch = dg.dungeon[wr][wc].get_ch()
-                    if ch == '#':
-                        fg = (125, 125, 125)
-                        bg = (10, 10, 10)
-                        glyph = ord('#')
-                    elif ch == '.':
-                        # Brighter, slightly bluish floor with lighter background
-                        fg = (200, 210, 235)
-                        bg = (35, 40, 55)
-                        glyph = ord('.')
-                    elif ch == '+':
-                        fg = (255, 215, 0)
-                        bg = (0, 0, 0)
-                        glyph = ord('+')
-                    else:
-                        fg = (255, 255, 255)
-                        bg = (0, 0, 0)
-                        glyph = ord(ch)
-                    # Apply fog-of-war dimming to unexplored tiles
-                    if not dg.explored[wr][wc]:
-                        fg = (int(fg[0] * 0.15), int(fg[1] * 0.15), int(fg[2] * 0.15))
-                        bg = (0, 0, 0)
-                    console.print(c, r, chr(glyph), fg=fg, bg=bg)
-
-            # Draw the player as a sprite-like glyph on top of non-wall tiles.
-            # Position is derived from pixel coords to allow sub-tile movement feel.
-            pr = int(round(dg.player_y / dg.tile_size)) - cam_y
-            pc = int(round(dg.player_x / dg.tile_size)) - cam_x
-            if 0 <= pr < view_h and 0 <= pc < view_w:
-                console.print(pc, pr, '@', fg=(255, 255, 255))
-            context.present(console)
-
-            # Process events (non-blocking to allow smooth movement)
-            for event in tcod.event.get():
-                if event.type == "QUIT":
-                    return
-                if event.type == "KEYDOWN":
-                    if event.sym == tcod.event.K_ESCAPE:
-                        return
-                    # Track held movement keys for continuous travel
-                    direction = movement_key_map.get(event.sym)
-                    if direction is not None:
-                        if direction in held_directions:
-                            held_directions.remove(direction)
-                        held_directions.insert(0, direction)
-                if event.type == "KEYUP":
-                    direction = movement_key_map.get(event.sym)
-                    if direction is not None and direction in held_directions:
-                        held_directions.remove(direction)
-
-            # Remove directions that are blocked by walls
-            for direction in list(held_directions):
-                check_dx = direction[0]
-                check_dy = direction[1]
-                if check_dx == 0 and check_dy == 0:
-                    continue
-                test_x = dg.player_x + check_dx * dg.player_radius
-                test_y = dg.player_y + check_dy * dg.player_radius
-                if not dg._can_move_to(test_x, test_y):
-                    held_directions.remove(direction)
-            
-            # Small sleep to prevent excessive CPU usage
-            time.sleep(0.001)
+            job = self.queue.get()
+            if job is None:
+                return
+            future, args = job
+            if not future.set_running_or_notify_cancel():
+                continue
+            try:
+                if self.processes is None:
+                    dg = generate_level(*args)
+                else:
+                    dg = self.processes.apply(generate_level, args)
+            except BaseException as e:
+                future.set_exception(e)
+            else:
+                future.set_result(dg)
+
+    def submit(self, level):
+        from concurrent.futures import Future
+        future = Future()
+        self.queue.put((future, self.level_args(level)))
+        return future
+
+    def level_seed(self, level):
+        return self.seed if level == 0 else derive_seed(self.seed, 'level', level)
+
+    def level_args(self, level):
+        # generate_level's arguments for a level
+        return self.width, self.height, self.level_seed(level), self.fov_radius, self.params
+
+    def current(self):
+        if self.dg is None:
+            self.dg = generate_level(*self.level_args(self.level))
+        return self.dg
+
+    def prefetch(self):
+        # Drop levels that fell out of the window, then queue the missing ones
+        # in order so the nearest level finishes first
+        wanted = range(self.level + 1, self.level + 1 + self.lookahead)
+        for level in list(self.pending):
+            if level not in wanted:
+                self.pending.pop(level).cancel()
+        for level in wanted:
+            if level not in self.pending:
+                self.pending[level] = self.submit(level)
+
+    def is_ready(self):
+        # True when advance() would not block
+        future = self.pending.get(self.level + 1)
+        return future is not None and future.done()
+
+    def advance(self):
+        # Move to the next level, waiting only if it is still being generated
+        next_level = self.level + 1
+        future = self.pending.pop(next_level, None)
+        if future is not None:
+            self.dg = future.result()
+        else:
+            self.dg = generate_level(*self.level_args(next_level))
+        self.level = next_level
+        self.prefetch()
+        return self.dg
+
+    def close(self):
+        for future in self.pending.values():
+            future.cancel()
+        self.pending.clear()
+        self.queue.put(None)
+        if self.processes is not None:
+            self.processes.terminate()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+# Save file layout (little-endian), version 1:
+#   header      SAVE_HEADER below
+#   tiles       width * height bytes, row-major (memory-mapped on load)
+#   rooms       room_count * 4 int32 (row, col, height, width)
+#   leaves      leaf_count * 4 int32 (min_row, min_col, max_row, max_col)
+#   explored    width * height bits, packed eight tiles per byte, LSB first
+#   links       uint32 count, then count * 2 int32 room indexes
+SAVE_MAGIC = b'RLDS'
+SAVE_VERSION = 1
+SAVE_HEADER = struct.Struct('<4sHxxIIqiiddII')
+SAVE_SUFFIX = '.rlds'
+
+
+def pack_bits(flags):
+    # Pack a bytearray of 0/1 flags into a bitset. Each of the eight bit planes
+    # is pulled out with a strided slice and merged as one big integer, so the
+    # work stays in C even for very large maps.
+    padded = bytes(flags) + bytes(-len(flags) % 8)
+    count = len(padded) // 8
+    packed = 0
+    for bit in range(8):
+        packed |= int.from_bytes(padded[bit::8], 'little') << bit
+    return packed.to_bytes(count, 'little')
+
+
+def unpack_bits(packed, length):
+    count = len(packed)
+    value = int.from_bytes(packed, 'little')
+    ones = int.from_bytes(b'\x01' * count, 'little')
+    flags = bytearray(count * 8)
+    for bit in range(8):
+        flags[bit::8] = ((value >> bit) & ones).to_bytes(count, 'little')
+    del flags[length:]
+    return flags
+
+
+def save_dungeon(dg, path):
+    # Written to a temporary file and renamed into place. A map memory-mapped
+    # from path itself is moved into memory first: Windows cannot replace a
+    # file that is still mapped.
+    seed = dg.seed if dg.seed is not None else -1
+    header = SAVE_HEADER.pack(SAVE_MAGIC, SAVE_VERSION, dg.width, dg.height, seed,
+                              dg.player_row, dg.player_col, dg.player_x, dg.player_y,
+                              len(dg.rooms), len(dg.leaves))
+    rooms = array('i')
+    for room in dg.rooms:
+        rooms.extend((room.row, room.col, room.height, room.width))
+    leaves = array('i')
+    for leaf in dg.leaves:
+        leaves.extend(leaf)
+    links = array('i')
+    for link in dg.room_links:
+        links.extend(link)
+    if sys.byteorder != 'little':
+        rooms.byteswap()
+        leaves.byteswap()
+        links.byteswap()
+
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    with open(tmp_path, 'wb') as fp:
+        fp.write(header)
+        fp.write(dg.tiles)
+        fp.write(rooms.tobytes())
+        fp.write(leaves.tobytes())
+        fp.write(pack_bits(dg.explored))
+        fp.write(struct.pack('<I', len(dg.room_links)))
+        fp.write(links.tobytes())
+    if dg.mapping is not None and os.path.exists(path) and os.path.samefile(dg.mapping[0], path):
+        dg.release_mapping()
+    os.replace(tmp_path, path)
+
+
+def load_dungeon(path):
+    # The tile grid is a copy-on-write memory map of the file: nothing is parsed
+    # or copied up front and edits never reach the file unless it is saved.
+    with open(path, 'rb') as fp:
+        mapped = mmap.mmap(fp.fileno(), 0, access=mmap.ACCESS_COPY)
+    view = memoryview(mapped)
+    if len(view) < SAVE_HEADER.size:
+        raise ValueError(f"{path} is not a dungeon save file")
+    (magic, version, width, height, seed, player_row, player_col,
+     player_x, player_y, room_count, leaf_count) = SAVE_HEADER.unpack_from(view)
+    if magic != SAVE_MAGIC:
+        raise ValueError(f"{path} is not a dungeon save file")
+    if version != SAVE_VERSION:
+        raise ValueError(f"{path} has unsupported save version {version}")
+
+    tiles_start = SAVE_HEADER.size
+    rooms_start = tiles_start + width * height
+    leaves_start = rooms_start + room_count * 16
+    explored_start = leaves_start + leaf_count * 16
+    explored_end = explored_start + (width * height + 7) // 8
+    if explored_end > len(view):
+        raise ValueError(f"{path} is truncated")
+
+    rooms = array('i')
+    rooms.frombytes(view[rooms_start:leaves_start])
+    leaves = array('i')
+    leaves.frombytes(view[leaves_start:explored_start])
+    if explored_end + 4 > len(view):
+        raise ValueError(f"{path} is truncated")
+    (link_count,) = struct.unpack_from('<I', view, explored_end)
+    links_start = explored_end + 4
+    if links_start + link_count * 8 > len(view):
+        raise ValueError(f"{path} is truncated")
+    links = array('i')
+    links.frombytes(view[links_start:links_start + link_count * 8])
+    if sys.byteorder != 'little':
+        rooms.byteswap()
+        leaves.byteswap()
+        links.byteswap()
+
+    # Corridor records are not saved; the carved tiles already hold them
+    dg = RLDungeonGenerator.from_tiles(width, height, seed if seed != -1 else None,
+                                       view[tiles_start:rooms_start],
+                                       [Room(*rooms[i:i + 4]) for i in range(0, len(rooms), 4)],
+                                       unpack_bits(view[explored_start:explored_end], width * height))
+    view.release()
+    dg.mapping = (path, mapped)
+    dg.leaves = [tuple(leaves[i:i + 4]) for i in range(0, len(leaves), 4)]
+    dg.room_links = [tuple(links[i:i + 2]) for i in range(0, len(links), 2)]
+    dg.player_row = player_row
+    dg.player_col = player_col
+    dg.player_x = player_x
+    dg.player_y = player_y
+    dg.last_revealed_tile = (player_row, player_col)
+    return dg
+
+
+def cache_path(cache_dir, width, height, seed, params=None):
+    # Cache file for a map keyed by everything that affects generation
+    key = repr((SAVE_VERSION, seed, width, height, sorted((params or {}).items())))
+    name = hashlib.sha256(key.encode('utf-8')).hexdigest()[:32]
+    return os.path.join(cache_dir, name + SAVE_SUFFIX)
+
+
+def cached_map(cache_dir, width, height, seed, params=None):
+    # Load the map for (seed, width, height, params) from cache_dir, generating
+    # and storing it on a miss. params are attribute overrides such as {'MAX': 12}.
+    path = cache_path(cache_dir, width, height, seed, params)
+    if os.path.exists(path):
+        return load_dungeon(path)
+    dg = RLDungeonGenerator(width, height, seed)
+    for name, value in (params or {}).items():
+        setattr(dg, name, value)
+    dg.generate_map()
+    os.makedirs(cache_dir, exist_ok=True)
+    save_dungeon(dg, path)
+    return dg
 
 
 def main() -> None:
@@ -507,15 +1586,147 @@ def main() -> None:
     parser.add_argument("--width", type=int, default=75, help="Dungeon width in tiles")
     parser.add_argument("--height", type=int, default=40, help="Dungeon height in tiles")
     parser.add_argument("--ascii", action="store_true", help="Print ASCII map to console instead of opening a window")
+    parser.add_argument("--seed", type=int, default=None, help="Seed for reproducible maps (first seed of a batch)")
+    parser.add_argument("--count", type=int, default=None, help="Generate this many maps with consecutive seeds and print them")
+    parser.add_argument("--workers", type=int, default=None, help="Worker processes for --count (default: one per CPU)")
+    parser.add_argument("--export", choices=EXPORT_FORMATS, default=None, help="Stream maps headlessly as JSONL or packed binary records")
+    parser.add_argument("--output", default="-", help="File for --export output (default: stdout)")
+    parser.add_argument("--chunked", action="store_true", help="Explore an unbounded world carved lazily in chunks (--width/--height size the --ascii window)")
+    parser.add_argument("--chunk-size", type=int, default=64, help="Chunk edge length in tiles for --chunked")
+    parser.add_argument("--max-chunks", type=int, default=64, help="Chunks kept in memory for --chunked before the least recently used is dropped")
+    parser.add_argument("--load", default=None, help="Open a map saved with --save instead of generating one")
+    parser.add_argument("--save", default=None, help="Save the map, player position and explored fog to this file on exit")
+    parser.add_argument("--cache-dir", default=None, help="Reuse pregenerated maps from this directory, keyed by seed and size (needs --seed)")
+    parser.add_argument("--fov", type=int, default=None, metavar="RADIUS", help="Reveal by symmetric shadowcasting with this sight radius instead of whole rooms")
+    parser.add_argument("--prefetch", type=int, default=1, choices=(0, 1, 2), help="Levels generated ahead in the background while playing (press '>' for the next level; 0 disables)")
+    parser.add_argument("--prefetch-worker", choices=("thread", "process"), default="thread", help="Run background level generation on a thread or a separate process")
+    parser.add_argument("--min-rooms", type=int, default=0, help="Skip seeds whose layout has fewer rooms (the seed used is printed to stderr)")
+    parser.add_argument("--max-corridor", type=int, default=None, help="Skip seeds whose layout needs a longer corridor")
+    parser.add_argument("--attempts", type=int, default=1000, help="Consecutive seeds tried for --min-rooms/--max-corridor")
+    parser.add_argument("--split-depth", type=int, default=0, help="Build one map from 2**N BSP subtrees planned in parallel (--workers processes)")
+    parser.add_argument("--exit-after-frames", type=int, default=None, help="Close the window after this many frames (for startup benchmarks)")
+    parser.add_argument("--loop-stats", action="store_true", help="Print frame pacing and CPU use of the window's game loop to stderr on exit")
+    parser.add_argument("--serve", action="store_true", help="Run a local HTTP service that generates maps on a process pool (--workers) and returns packed records")
+    parser.add_argument("--host", default="127.0.0.1", help="Address for --serve")
+    parser.add_argument("--port", type=int, default=8765, help="Port for --serve")
+    parser.add_argument("--socket", default=None, help="Serve on this Unix socket instead of TCP")
+    parser.add_argument("--serve-cache-mb", type=int, default=256, help="Memory for --serve's cache of recent maps")
+    parser.add_argument("--profile", action="store_true", help="Print per-phase timings and counters for a single map to stderr")
+    parser.add_argument("--profile-output", default=None, help="With --profile, also save cProfile stats of the generation phases to this file")
     args = parser.parse_args()
+    if args.chunked and (args.load or args.save or args.cache_dir):
+        parser.error("--load, --save and --cache-dir do not apply to --chunked worlds")
+    if args.cache_dir and args.seed is None:
+        parser.error("--cache-dir needs --seed so cached maps can be found again")
+    constrained = args.min_rooms > 0 or args.max_corridor is not None
+    if args.seed is not None:
+        # Every seed of a batch (or of the constrained search) must fit the records
+        last_seed = args.seed + max(args.count or 1, args.attempts if constrained else 1) - 1
+        if args.seed < 0 or last_seed >= SEED_LIMIT:
+            parser.error(f"--seed must lie between 0 and {SEED_LIMIT - 1}, including every seed of a batch")
+    if constrained and (args.chunked or args.load or args.cache_dir or args.profile or args.count is not None or args.export):
+        parser.error("--min-rooms and --max-corridor only apply when generating a single map")
+    if args.split_depth and (constrained or args.chunked or args.load or args.cache_dir or args.profile
+                             or args.count is not None or args.export):
+        parser.error("--split-depth only applies when generating a single map")
+    if args.chunked and args.chunk_size < MIN_CHUNK_SIZE:
+        parser.error(f"--chunk-size must be at least {MIN_CHUNK_SIZE}")
+    if args.fov is not None and (args.chunked or args.fov < 1):
+        parser.error("--fov needs a radius of at least 1 and does not apply to --chunked worlds")
 
-    dg = RLDungeonGenerator(args.width, args.height)
-    dg.generate_map()
+    if args.serve:
+        # Imported here because the server module itself imports this one
+        from dungeon_server import serve
+        serve(args.host, args.port, args.socket, args.workers, args.serve_cache_mb << 20)
+        return
+
+    if args.export is not None:
+        count = args.count if args.count is not None else 1
+        base_seed = args.seed if args.seed is not None else Random().randrange(2 ** 32)
+        maps = generate_batch(range(base_seed, base_seed + count), args.width, args.height, args.workers,
+                              geometry_only=args.export == 'geometry')
+        if args.output == "-":
+            export_maps(maps, sys.stdout.buffer, args.export)
+            sys.stdout.buffer.flush()
+        else:
+            with open(args.output, "wb", buffering=EXPORT_BUFFER_SIZE) as fp:
+                export_maps(maps, fp, args.export)
+        return
+
+    if args.count is not None:
+        base_seed = args.seed if args.seed is not None else Random().randrange(2 ** 32)
+        seeds = range(base_seed, base_seed + args.count)
+        for i, dg in enumerate(generate_batch(seeds, args.width, args.height, args.workers)):
+            if i > 0:
+                print()
+            dg.print_map()
+        return
+
+    stats = None
+    if args.loop_stats and not args.ascii:
+        from dungeon_render import LoopStats
+        stats = LoopStats()
+
+    if args.chunked:
+        dg = ChunkedDungeon(args.seed, args.chunk_size, args.max_chunks)
+        dg.generate_map()
+        if args.ascii:
+            dg.print_map(args.height, args.width)
+        else:
+            render_with_tcod(dg, stats=stats, max_frames=args.exit_after_frames)
+            if stats is not None:
+                print(stats.report(), file=sys.stderr)
+        return
+
+    if args.load:
+        dg = load_dungeon(args.load)
+    elif args.cache_dir and not args.profile:
+        dg = cached_map(args.cache_dir, args.width, args.height, args.seed)
+    elif args.split_depth:
+        dg = generate_parallel_map(args.width, args.height, args.seed, args.split_depth, args.workers)
+    elif constrained:
+        base_seed = args.seed if args.seed is not None else Random().randrange(2 ** 32)
+        dg = generate_constrained_map(args.width, args.height, range(base_seed, base_seed + args.attempts),
+                                      args.min_rooms, args.max_corridor)
+        if dg is None:
+            sys.exit(f"No layout in {args.attempts} seeds from {base_seed} meets the constraints")
+        print(f"seed {dg.seed}", file=sys.stderr)
+    else:
+        dg = generate_profiled_map(args) if args.profile else generate_seeded_map(args.width, args.height, args.seed)
+    if args.fov is not None:
+        dg.set_fov(args.fov)
 
     if args.ascii:
         dg.print_map()
+    elif args.prefetch:
+        # Later levels are generated the same way as this one
+        params = {'cache_dir': args.cache_dir, 'split_depth': args.split_depth, 'min_rooms': args.min_rooms,
+                  'max_corridor': args.max_corridor, 'attempts': args.attempts}
+        with LevelManager(dg.width, dg.height, dg.seed, args.prefetch, args.prefetch_worker, args.fov, first=dg,
+                          params=params) as levels:
+            dg = render_with_tcod(dg, levels, stats, args.exit_after_frames)
     else:
-        render_with_tcod(dg)
+        render_with_tcod(dg, stats=stats, max_frames=args.exit_after_frames)
+    if stats is not None and not args.ascii:
+        print(stats.report(), file=sys.stderr)
+
+    if args.save:
+        save_dungeon(dg, args.save)
+
+
+def generate_profiled_map(args):
+    dg = RLDungeonGenerator(args.width, args.height, args.seed)
+    profile = dg.enable_profiling()
+    profiler = None
+    if args.profile_output:
+        import cProfile
+        profiler = cProfile.Profile()
+        profile.add_hook(cprofile_hook(profiler))
+    dg.generate_map()
+    print(profile.report(), file=sys.stderr)
+    if profiler is not None:
+        profiler.dump_stats(args.profile_output)
+    return dg
 
 if __name__ == "__main__":
     main()
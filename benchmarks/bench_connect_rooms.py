@@ -0,0 +1,71 @@
+# Benchmark for the room connection pass.
+#
+# Builds BSP room layouts of increasing size and times connect_rooms (edges in
+# doubling distance bands from a bucket grid, joined with a union-find Kruskal
+# pass) against the original all-pairs connect_rooms_pairwise. The edges column
+# is the number of adjacency edges connect_rooms evaluated.
+#
+#   python benchmarks/bench_connect_rooms.py
+#   python benchmarks/bench_connect_rooms.py --rooms 10 100 1000 --pairwise-limit 1000
+from math import sqrt
+import argparse
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from RLDungeonGenerator import RLDungeonGenerator
+
+# Rough number of map tiles per carved room with the default MAX of 15
+TILES_PER_ROOM = 140
+
+def build_layout(target_rooms, seed):
+    side = max(20, int(sqrt(target_rooms * TILES_PER_ROOM)))
+    dg = RLDungeonGenerator(side, side, seed)
+    dg.random_split(1, 1, side - 1, side - 1)
+    dg.carve_rooms()
+    return dg
+
+def copy_layout(dg):
+    other = RLDungeonGenerator(dg.width, dg.height)
+    other.leaves = list(dg.leaves)
+    other.rooms = list(dg.rooms)
+    other.tiles[:] = dg.tiles
+    return other
+
+def time_pass(dg, method, seed):
+    dg.rng.seed(seed)
+    start = time.perf_counter()
+    getattr(dg, method)()
+    return time.perf_counter() - start
+
+def count_edges(dg, seed):
+    # Adjacency edges connect_rooms generated, read from a profiled run on a copy
+    other = copy_layout(dg)
+    other.rng.seed(seed)
+    profile = other.enable_profiling()
+    other.connect_rooms()
+    return profile.counters.get('adjacency_pairs', 0)
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark connect_rooms scaling")
+    parser.add_argument("--rooms", type=int, nargs="+", default=[10, 100, 1000, 10000], help="Target room counts")
+    parser.add_argument("--pairwise-limit", type=int, default=1000, help="Skip the all-pairs pass above this many rooms")
+    parser.add_argument("--seed", type=int, default=1234)
+    args = parser.parse_args()
+
+    print(f"{'rooms':>8} {'map':>11} {'edges':>10} {'connect_rooms':>14} {'pairwise':>10}")
+    for target in args.rooms:
+        dg = build_layout(target, args.seed)
+        edges = count_edges(dg, args.seed)
+        fast = time_pass(copy_layout(dg), 'connect_rooms', args.seed)
+        if len(dg.rooms) <= args.pairwise_limit:
+            slow = f"{time_pass(copy_layout(dg), 'connect_rooms_pairwise', args.seed):10.4f}"
+        else:
+            slow = f"{'-':>10}"
+        size = f"{dg.width}x{dg.height}"
+        print(f"{len(dg.rooms):>8} {size:>11} {edges:>10} {fast:14.4f} {slow}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,219 @@
+# Benchmark suite for every generation phase plus the per-frame game loop costs.
+#
+# For each map size in the matrix this times generate_map end to end and then
+# each phase on its own (construction, random_split, carve_rooms, connect_rooms,
+# spawn_player, reveal_current_area), followed by update_movement/_can_move_to
+# per frame, one shadowcast field of view (uncached and cached), one EntityBatch
+# step for 10k entities and, when tcod is installed, one draw_frame into a
+# headless console (full redraw and the renderer's idle no-change path).
+# Seeds are fixed so runs are comparable. Results are written as JSON.
+#
+#   python benchmarks/bench_phases.py --output bench.json
+#   python benchmarks/bench_phases.py --sizes 75x40 1000x1000 --compare bench.json
+import argparse
+import json
+import os
+import platform
+import subprocess
+import sys
+import time
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..')
+sys.path.insert(0, ROOT)
+
+from RLDungeonGenerator import RLDungeonGenerator
+from dungeon_entities import EntityBatch
+from dungeon_render import ViewportRenderer
+from dungeon_render import draw_frame
+from dungeon_render import tcod
+
+DEFAULT_SIZES = ['75x40', '250x250', '1000x1000', '2000x2000', '4000x4000']
+PHASES = ['random_split', 'carve_rooms', 'connect_rooms', 'spawn_player', 'reveal_current_area']
+FRAME_TIME = 1.0 / 60.0
+# Held direction cycle for the movement benchmark: right, down, left, up
+WALK_PATTERN = [(1.0, 0.0), (0.0, 1.0), (-1.0, 0.0), (0.0, -1.0)]
+
+def parse_size(text):
+    width, height = text.lower().split('x')
+    return int(width), int(height)
+
+def timed(fn, *args):
+    start = time.perf_counter()
+    fn(*args)
+    return time.perf_counter() - start
+
+def bench_generate(width, height, seed):
+    dg = RLDungeonGenerator(width, height, seed)
+    return timed(dg.generate_map)
+
+def bench_phases(width, height, seed):
+    start = time.perf_counter()
+    dg = RLDungeonGenerator(width, height, seed)
+    times = {'init': time.perf_counter() - start}
+    times['random_split'] = timed(dg.random_split, 1, 1, height - 1, width - 1)
+    for phase in PHASES[1:]:
+        times[phase] = timed(getattr(dg, phase))
+    return dg, times
+
+def bench_movement(dg, frames):
+    pattern_len = 30
+    start = time.perf_counter()
+    for frame in range(frames):
+        dg.update_movement(FRAME_TIME, WALK_PATTERN[(frame // pattern_len) % len(WALK_PATTERN)])
+    update = (time.perf_counter() - start) / frames
+
+    start = time.perf_counter()
+    for _ in range(frames):
+        dg._can_move_to(dg.player_x + 1.0, dg.player_y)
+    probe = (time.perf_counter() - start) / frames
+    return {'update_movement': update, '_can_move_to': probe}
+
+def bench_fov(dg, radius, frames):
+    # Shadowcasting from the spawn tile: fresh each time, then from the cache
+    dg.set_fov(radius)
+    start = time.perf_counter()
+    for _ in range(frames):
+        dg.fov_cache.clear()
+        dg.reveal_fov()
+    uncached = (time.perf_counter() - start) / frames
+    start = time.perf_counter()
+    for _ in range(frames):
+        dg.reveal_fov()
+    cached = (time.perf_counter() - start) / frames
+    dg.set_fov(None)
+    return {'fov': uncached, 'fov_cached': cached}
+
+def bench_entities(dg, count, frames):
+    # One EntityBatch step for count entities spread over the rooms
+    batch = EntityBatch(dg, count)
+    rooms = dg.rooms or [None]
+    for i in range(count):
+        room = rooms[i % len(rooms)]
+        if room is None:
+            batch.add(dg.player_x, dg.player_y)
+        else:
+            batch.add((room.col + room.width / 2) * dg.tile_size, (room.row + room.height / 2) * dg.tile_size)
+    dx = [WALK_PATTERN[i % len(WALK_PATTERN)][0] for i in range(count)]
+    dy = [WALK_PATTERN[i % len(WALK_PATTERN)][1] for i in range(count)]
+    start = time.perf_counter()
+    for _ in range(frames):
+        batch.step(FRAME_TIME, dx, dy)
+    return (time.perf_counter() - start) / frames
+
+def bench_draw(dg, frames, view_w, view_h):
+    if tcod is None:
+        return None
+    console = tcod.console.Console(min(view_w, dg.width), min(view_h, dg.height), order="F")
+    start = time.perf_counter()
+    for _ in range(frames):
+        draw_frame(console, dg)
+    full = (time.perf_counter() - start) / frames
+
+    # Steady state of the game loop: nothing moved, so the renderer skips the frame
+    renderer = ViewportRenderer()
+    renderer.draw(console, dg)
+    start = time.perf_counter()
+    for _ in range(frames):
+        renderer.draw(console, dg)
+    idle = (time.perf_counter() - start) / frames
+    return {'draw_frame': full, 'draw_idle': idle}
+
+def git_revision():
+    try:
+        out = subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=ROOT,
+                             capture_output=True, text=True, check=True)
+        return out.stdout.strip()
+    except Exception:
+        return None
+
+def run(args):
+    results = []
+    for size in args.sizes:
+        width, height = parse_size(size)
+        entry = {'size': size, 'width': width, 'height': height, 'seed': args.seed}
+
+        totals = [bench_generate(width, height, args.seed) for _ in range(args.repeat)]
+        entry['generate_map'] = min(totals)
+
+        best = {}
+        dg = None
+        for _ in range(args.repeat):
+            dg, times = bench_phases(width, height, args.seed)
+            for phase, seconds in times.items():
+                best[phase] = min(seconds, best.get(phase, seconds))
+        entry['phases'] = best
+        entry['rooms'] = len(dg.rooms)
+        entry['leaves'] = len(dg.leaves)
+
+        entry['per_frame'] = bench_movement(dg, args.frames)
+        entry['per_frame'].update(bench_fov(dg, args.fov_radius, args.frames))
+        entry['per_frame']['entity_batch_step'] = bench_entities(dg, args.entities, args.entity_frames)
+        draw = bench_draw(dg, args.draw_frames, args.view_width, args.view_height)
+        if draw is not None:
+            entry['per_frame'].update(draw)
+
+        results.append(entry)
+        print(f"{size:>10}  generate_map {entry['generate_map']:.4f}s  rooms {entry['rooms']}", file=sys.stderr)
+    return results
+
+def flatten(results):
+    flat = {}
+    for entry in results:
+        flat[(entry['size'], 'generate_map')] = entry['generate_map']
+        for phase, seconds in entry['phases'].items():
+            flat[(entry['size'], phase)] = seconds
+        for name, seconds in entry['per_frame'].items():
+            flat[(entry['size'], name)] = seconds
+    return flat
+
+def compare(results, baseline_path):
+    with open(baseline_path) as fp:
+        baseline = flatten(json.load(fp)['results'])
+    current = flatten(results)
+    print(f"{'size':>10} {'measure':>22} {'baseline':>10} {'current':>10} {'ratio':>7}", file=sys.stderr)
+    for key, seconds in current.items():
+        if key not in baseline or baseline[key] <= 0:
+            continue
+        ratio = seconds / baseline[key]
+        print(f"{key[0]:>10} {key[1]:>22} {baseline[key]:10.5f} {seconds:10.5f} {ratio:7.2f}", file=sys.stderr)
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark every generation phase across map sizes")
+    parser.add_argument("--sizes", nargs="+", default=DEFAULT_SIZES, help="Map sizes as WIDTHxHEIGHT")
+    parser.add_argument("--seed", type=int, default=20240601)
+    parser.add_argument("--repeat", type=int, default=1, help="Runs per size; the fastest is kept")
+    parser.add_argument("--frames", type=int, default=600, help="Frames for the movement benchmark")
+    parser.add_argument("--fov-radius", type=int, default=8, help="Sight radius for the field of view benchmark")
+    parser.add_argument("--entities", type=int, default=10000, help="Entities in the batched movement benchmark")
+    parser.add_argument("--entity-frames", type=int, default=60, help="Frames for the batched movement benchmark")
+    parser.add_argument("--draw-frames", type=int, default=120, help="Frames for the headless draw benchmark")
+    parser.add_argument("--view-width", type=int, default=40)
+    parser.add_argument("--view-height", type=int, default=25)
+    parser.add_argument("--output", default="-", help="JSON results file (default: stdout)")
+    parser.add_argument("--compare", default=None, help="Earlier JSON results to print ratios against")
+    args = parser.parse_args()
+
+    results = run(args)
+    report = {
+        'meta': {
+            'python': platform.python_version(),
+            'platform': platform.platform(),
+            'revision': git_revision(),
+            'tcod': tcod is not None,
+            'timestamp': time.time(),
+        },
+        'results': results,
+    }
+
+    if args.compare:
+        compare(results, args.compare)
+
+    if args.output == "-":
+        json.dump(report, sys.stdout, indent=2)
+        print()
+    else:
+        with open(args.output, "w") as fp:
+            json.dump(report, fp, indent=2)
+
+if __name__ == "__main__":
+    main()
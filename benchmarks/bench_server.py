@@ -0,0 +1,147 @@
+# Load test for the --serve generation service.
+#
+# Opens a number of keep-alive connections and issues /map requests for seeds
+# drawn from a fixed pool, so later requests mix cache hits, joins on maps
+# already being generated, and fresh generations. Reports throughput, latency
+# percentiles and the server's own counters as JSON. Without --url it starts
+# a server for the run and stops it afterwards.
+#
+#   python benchmarks/bench_server.py --requests 5000 --connections 32
+#   python benchmarks/bench_server.py --url 127.0.0.1:8765 --distinct-seeds 50
+import argparse
+import asyncio
+import json
+import os
+import platform
+import random
+import socket
+import subprocess
+import sys
+import time
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..')
+sys.path.insert(0, ROOT)
+
+from dungeon_export import decode_packed
+
+def percentile(sorted_values, fraction):
+    if not sorted_values:
+        return None
+    return sorted_values[min(len(sorted_values) - 1, int(len(sorted_values) * fraction))]
+
+async def get(reader, writer, path):
+    writer.write(f"GET {path} HTTP/1.1\r\nHost: bench\r\n\r\n".encode('latin-1'))
+    await writer.drain()
+    head = await reader.readuntil(b'\r\n\r\n')
+    lines = head.decode('latin-1').split('\r\n')
+    status = int(lines[0].split(' ', 2)[1])
+    length = 0
+    for line in lines[1:]:
+        name, _, value = line.partition(':')
+        if name.strip().lower() == 'content-length':
+            length = int(value)
+    body = await reader.readexactly(length)
+    return status, body
+
+async def connection(host, port, jobs, latencies, failures):
+    reader, writer = await asyncio.open_connection(host, port)
+    try:
+        while jobs:
+            path = jobs.pop()
+            start = time.perf_counter()
+            status, body = await get(reader, writer, path)
+            latencies.append(time.perf_counter() - start)
+            if status != 200:
+                failures.append(status)
+            else:
+                decode_packed(body)
+    finally:
+        writer.close()
+
+async def load(host, port, args):
+    rng = random.Random(args.seed)
+    seeds = [args.seed + k for k in range(args.distinct_seeds)]
+    jobs = [f"/map?seed={rng.choice(seeds)}&width={args.width}&height={args.height}"
+            for _ in range(args.requests)]
+    latencies = []
+    failures = []
+    start = time.perf_counter()
+    await asyncio.gather(*(connection(host, port, jobs, latencies, failures) for _ in range(args.connections)))
+    elapsed = time.perf_counter() - start
+
+    reader, writer = await asyncio.open_connection(host, port)
+    _, body = await get(reader, writer, '/stats')
+    writer.close()
+
+    latencies.sort()
+    return {
+        'requests': len(latencies),
+        'failures': len(failures),
+        'seconds': elapsed,
+        'requests_per_second': len(latencies) / elapsed if elapsed > 0 else None,
+        'latency_ms': {name: 1000.0 * percentile(latencies, fraction)
+                       for name, fraction in (('p50', 0.50), ('p90', 0.90), ('p99', 0.99), ('max', 1.0))},
+        'server': json.loads(body),
+    }
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+def start_server(port, workers):
+    command = [sys.executable, os.path.join(ROOT, 'RLDungeonGenerator.py'), '--serve', '--port', str(port)]
+    if workers:
+        command += ['--workers', str(workers)]
+    server = subprocess.Popen(command, stdout=subprocess.PIPE, text=True)
+    # The server prints one line once it is listening
+    server.stdout.readline()
+    return server
+
+def main():
+    parser = argparse.ArgumentParser(description="Throughput and latency of the --serve generation service")
+    parser.add_argument("--url", default=None, help="HOST:PORT of a running server (default: start one)")
+    parser.add_argument("--workers", type=int, default=None, help="Worker processes for a server started here")
+    parser.add_argument("--requests", type=int, default=2000)
+    parser.add_argument("--connections", type=int, default=16)
+    parser.add_argument("--distinct-seeds", type=int, default=200, help="Size of the seed pool requests draw from")
+    parser.add_argument("--seed", type=int, default=20240601)
+    parser.add_argument("--width", type=int, default=75)
+    parser.add_argument("--height", type=int, default=40)
+    parser.add_argument("--output", default="-", help="JSON results file (default: stdout)")
+    args = parser.parse_args()
+
+    server = None
+    if args.url:
+        host, port = args.url.rsplit(':', 1)
+        port = int(port)
+    else:
+        host, port = '127.0.0.1', free_port()
+        server = start_server(port, args.workers)
+    try:
+        results = asyncio.run(load(host, port, args))
+    finally:
+        if server is not None:
+            server.terminate()
+            server.wait()
+
+    report = {
+        'meta': {
+            'python': platform.python_version(),
+            'platform': platform.platform(),
+            'timestamp': time.time(),
+            'size': f"{args.width}x{args.height}",
+            'connections': args.connections,
+            'distinct_seeds': args.distinct_seeds,
+        },
+        'results': results,
+    }
+    if args.output == "-":
+        json.dump(report, sys.stdout, indent=2)
+        print()
+    else:
+        with open(args.output, "w") as fp:
+            json.dump(report, fp, indent=2)
+
+if __name__ == "__main__":
+    main()
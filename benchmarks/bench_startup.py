@@ -0,0 +1,94 @@
+# Startup benchmark: wall time from launching RLDungeonGenerator.py to done.
+#
+# Times fresh interpreter runs of the --ascii path (no window, so neither tcod
+# nor NumPy should be imported) and, when tcod is installed, of a windowed run
+# that exits after its first presented frame. Windowed runs are timed twice:
+# with an empty tileset cache directory (the first run builds the cache) and
+# with a warm one. Windows open on SDL's dummy video driver so the benchmark
+# works headless. Results are written as JSON.
+#
+#   python benchmarks/bench_startup.py --runs 10
+import argparse
+import json
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+import time
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..')
+SCRIPT = os.path.join(ROOT, 'RLDungeonGenerator.py')
+HEADLESS_ENV = {'SDL_VIDEODRIVER': 'dummy', 'SDL_RENDER_DRIVER': 'software', 'SDL_AUDIODRIVER': 'dummy'}
+
+def summarize(times):
+    times = sorted(times)
+    return {
+        'runs': len(times),
+        'min_ms': 1000.0 * times[0],
+        'median_ms': 1000.0 * times[len(times) // 2],
+        'mean_ms': 1000.0 * sum(times) / len(times),
+    }
+
+def timed_run(arguments, env):
+    start = time.perf_counter()
+    subprocess.run([sys.executable, SCRIPT] + arguments, env=env, check=True,
+                   stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    return time.perf_counter() - start
+
+def has_tcod():
+    try:
+        import tcod  # noqa: F401
+    except ImportError:
+        return False
+    return True
+
+def run(args):
+    base = [f'--seed={args.seed}', f'--width={args.width}', f'--height={args.height}']
+    env = dict(os.environ)
+    results = {'ascii': summarize([timed_run(base + ['--ascii'], env) for _ in range(args.runs)])}
+    if not has_tcod():
+        return results
+
+    window = base + ['--exit-after-frames', '1']
+    env.update(HEADLESS_ENV)
+    cold = []
+    with tempfile.TemporaryDirectory() as cache_dir:
+        for k in range(args.runs):
+            # A fresh subdirectory per run so every cold run builds the cache
+            env['RLDUNGEON_CACHE_DIR'] = os.path.join(cache_dir, str(k))
+            cold.append(timed_run(window, env))
+        # The last cold run left its cache behind; reuse it for the warm runs
+        warm = [timed_run(window, env) for _ in range(args.runs)]
+    results['window_cold_cache'] = summarize(cold)
+    results['window_warm_cache'] = summarize(warm)
+    return results
+
+def main():
+    parser = argparse.ArgumentParser(description="Time script startup for the ASCII and windowed paths")
+    parser.add_argument("--runs", type=int, default=5, help="Runs per measurement")
+    parser.add_argument("--seed", type=int, default=20240601)
+    parser.add_argument("--width", type=int, default=75)
+    parser.add_argument("--height", type=int, default=40)
+    parser.add_argument("--output", default="-", help="JSON results file (default: stdout)")
+    args = parser.parse_args()
+
+    results = run(args)
+    report = {
+        'meta': {
+            'python': platform.python_version(),
+            'platform': platform.platform(),
+            'timestamp': time.time(),
+            'size': f"{args.width}x{args.height}",
+        },
+        'results': results,
+    }
+    if args.output == "-":
+        json.dump(report, sys.stdout, indent=2)
+        print()
+    else:
+        with open(args.output, "w") as fp:
+            json.dump(report, fp, indent=2)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,283 @@
+# Map validation and summary statistics for large seed sweeps.
+#
+# Everything works on the packed tile bytes rather than on dungeon[r][c]:
+# walkable tiles are found with one C-level translate, split into horizontal
+# runs with a regex, and runs that touch on neighbouring rows are merged with
+# union-find. Component labeling therefore costs one Python step per run
+# instead of one per tile. Per-map stats can be streamed over a batch into a
+# StatsSummary, which keeps histograms and reports aggregate distributions.
+#
+#   python dungeon_analysis.py --seed 0 --count 100000 --workers 8
+#   python dungeon_analysis.py --input maps.bin
+from bisect import bisect_right
+from collections import Counter
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from array import array
+import argparse
+import json
+import os
+import re
+import sys
+
+from RLDungeonGenerator import DOOR
+from RLDungeonGenerator import FLOOR
+from RLDungeonGenerator import WALKABLE_TABLE
+from RLDungeonGenerator import find_root
+from RLDungeonGenerator import generate_seeded_map
+from dungeon_export import read_packed
+
+RUN = re.compile(rb'\x01+')
+# Maps with unreachable tiles whose seeds are listed in a report
+MAX_FAILURES = 100
+
+
+def find_runs(mask, width, height):
+    # (row, start_col, end_col) for every horizontal run of set bytes in a
+    # one-byte-per-tile mask, in row-major order. A zero byte after every row
+    # keeps runs from wrapping onto the next one.
+    stride = width + 1
+    padded = b'\x00'.join(mask[i:i + width] for i in range(0, width * height, width))
+    runs = []
+    for match in RUN.finditer(padded):
+        row, col = divmod(match.start(), stride)
+        runs.append((row, col, col + match.end() - match.start()))
+    return runs
+
+
+class Components:
+    # 4-connected components of the set tiles of a mask. Components are
+    # numbered in row-major order of their first tile; sizes[k] is the tile
+    # count of component k.
+    def __init__(self, mask, width, height):
+        self.width = width
+        self.height = height
+        runs = find_runs(mask, width, height)
+        parent = list(range(len(runs)))
+
+        row = -2
+        row_start = 0
+        above_start = above_end = 0
+        j = 0
+        for k, (r, c0, c1) in enumerate(runs):
+            if r != row:
+                # The runs of the previous row, if it is directly above
+                if r == row + 1:
+                    above_start, above_end = row_start, k
+                else:
+                    above_start = above_end = k
+                row = r
+                row_start = k
+                j = above_start
+            # Skip runs above that end before this one starts, then merge with
+            # every run above that overlaps it
+            while j < above_end and runs[j][2] <= c0:
+                j += 1
+            m = j
+            while m < above_end and runs[m][1] < c1:
+                a = find_root(parent, k)
+                b = find_root(parent, m)
+                if a != b:
+                    parent[max(a, b)] = min(a, b)
+                m += 1
+
+        numbers = {}
+        run_component = []
+        sizes = []
+        for k, (r, c0, c1) in enumerate(runs):
+            root = find_root(parent, k)
+            number = numbers.get(root)
+            if number is None:
+                number = numbers[root] = len(sizes)
+                sizes.append(0)
+            run_component.append(number)
+            sizes[number] += c1 - c0
+
+        self.runs = runs
+        self.run_component = run_component
+        self.sizes = sizes
+        self.starts = [r * width + c0 for r, c0, _ in runs]
+
+    def __len__(self):
+        return len(self.sizes)
+
+    def component_at(self, row, col):
+        # Component number of the tile at (row, col), or None if it is not set
+        if row < 0 or col < 0 or row >= self.height or col >= self.width:
+            return None
+        k = bisect_right(self.starts, row * self.width + col) - 1
+        if k < 0:
+            return None
+        r, _, c1 = self.runs[k]
+        if r != row or col >= c1:
+            return None
+        return self.run_component[k]
+
+    def labels(self):
+        # Component number per tile, row-major, -1 where the mask is unset
+        labels = array('i', [-1]) * (self.width * self.height)
+        for (r, c0, c1), number in zip(self.runs, self.run_component):
+            start = r * self.width + c0
+            labels[start:start + c1 - c0] = array('i', [number]) * (c1 - c0)
+        return labels
+
+
+def analyze_tiles(tiles, width, height, spawn, rooms=None, seed=None):
+    # Stats for one map given its raw tile bytes and spawn (row, col). Room
+    # rectangles, when known, also give the corridors: walkable tiles outside
+    # every room, measured per connected piece.
+    tiles = bytes(tiles)
+    floor_tiles = tiles.count(FLOOR)
+    door_tiles = tiles.count(DOOR)
+    walkable = tiles.translate(WALKABLE_TABLE)
+    components = Components(walkable, width, height)
+    spawn_component = components.component_at(*spawn)
+    reachable = components.sizes[spawn_component] if spawn_component is not None else 0
+    stats = {
+        'seed': seed,
+        'width': width,
+        'height': height,
+        'floor_tiles': floor_tiles,
+        'door_tiles': door_tiles,
+        'floor_ratio': (floor_tiles + door_tiles) / (width * height),
+        'components': len(components),
+        'reachable_tiles': reachable,
+        'unreachable_tiles': floor_tiles + door_tiles - reachable,
+    }
+    if rooms is not None:
+        corridors = bytearray(walkable)
+        for room in rooms:
+            blank = bytes(room.width)
+            for i in range(room.row * width + room.col, (room.row + room.height) * width + room.col, width):
+                corridors[i:i + room.width] = blank
+        stats['rooms'] = len(rooms)
+        stats['corridor_lengths'] = Components(corridors, width, height).sizes
+    return stats
+
+
+def analyze_map(dg):
+    return analyze_tiles(dg.tiles, dg.width, dg.height, (dg.player_row, dg.player_col), dg.rooms, dg.seed)
+
+
+def analyze_seed(width, height, seed):
+    return analyze_map(generate_seeded_map(width, height, seed))
+
+
+def analyze_seeds(seeds, width, height, workers=None):
+    # Generate and analyze one map per seed over a process pool, yielding stats
+    # in seed order. Only the small stats dicts travel back from the workers.
+    if workers == 1:
+        for seed in seeds:
+            yield analyze_seed(width, height, seed)
+        return
+
+    workers = workers or os.cpu_count() or 1
+    with ProcessPoolExecutor(workers) as pool:
+        window = workers * 4
+        pending = deque()
+        for seed in seeds:
+            pending.append(pool.submit(analyze_seed, width, height, seed))
+            if len(pending) >= window:
+                yield pending.popleft().result()
+        while pending:
+            yield pending.popleft().result()
+
+
+def analyze_packed(fp):
+    # Stats for every record of a file written with --export packed (no room
+    # data, so corridor lengths and room counts are not reported)
+    for info, tiles in read_packed(fp):
+        yield analyze_tiles(tiles, info['width'], info['height'], info['spawn'], seed=info['seed'])
+
+
+def distribution(histogram):
+    # count, min, max, mean and percentiles of a value -> occurrences Counter
+    total = sum(histogram.values())
+    if total == 0:
+        return {'count': 0}
+    values = sorted(histogram)
+    result = {
+        'count': total,
+        'min': values[0],
+        'max': values[-1],
+        'mean': sum(value * n for value, n in histogram.items()) / total,
+    }
+    targets = [('p50', 0.50), ('p90', 0.90), ('p99', 0.99)]
+    seen = 0
+    for value in values:
+        seen += histogram[value]
+        while targets and seen >= targets[0][1] * total:
+            result[targets.pop(0)[0]] = value
+    return result
+
+
+class StatsSummary:
+    # Streaming aggregate of analyze_* results. Memory grows with the number
+    # of distinct values, not with the number of maps.
+    METRICS = ('floor_ratio', 'rooms', 'door_tiles', 'components', 'unreachable_tiles', 'corridor_lengths')
+
+    def __init__(self, max_failures=MAX_FAILURES):
+        self.maps = 0
+        self.histograms = {name: Counter() for name in self.METRICS}
+        self.failure_count = 0
+        self.failures = []
+        self.max_failures = max_failures
+
+    def add(self, stats):
+        self.maps += 1
+        for name in self.METRICS:
+            value = stats.get(name)
+            if value is None:
+                continue
+            if name == 'corridor_lengths':
+                self.histograms[name].update(value)
+            elif name == 'floor_ratio':
+                self.histograms[name][round(value, 3)] += 1
+            else:
+                self.histograms[name][value] += 1
+        if stats['unreachable_tiles']:
+            self.failure_count += 1
+            if len(self.failures) < self.max_failures:
+                self.failures.append(stats['seed'])
+
+    def extend(self, stats_iter):
+        for stats in stats_iter:
+            self.add(stats)
+        return self
+
+    def report(self):
+        return {
+            'maps': self.maps,
+            'unreachable_maps': self.failure_count,
+            'unreachable_seeds': self.failures,
+            'distributions': {name: distribution(histogram)
+                              for name, histogram in self.histograms.items() if histogram},
+        }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Validate generated maps and summarise their statistics")
+    parser.add_argument("--width", type=int, default=75)
+    parser.add_argument("--height", type=int, default=40)
+    parser.add_argument("--seed", type=int, default=0, help="First seed of the sweep")
+    parser.add_argument("--count", type=int, default=1000, help="Number of consecutive seeds to check")
+    parser.add_argument("--workers", type=int, default=None, help="Worker processes (default: one per CPU)")
+    parser.add_argument("--input", default=None, help="Analyze a file written with --export packed instead of generating")
+    args = parser.parse_args()
+
+    summary = StatsSummary()
+    if args.input:
+        with open(args.input, "rb") as fp:
+            summary.extend(analyze_packed(fp))
+    else:
+        seeds = range(args.seed, args.seed + args.count)
+        summary.extend(analyze_seeds(seeds, args.width, args.height, args.workers))
+
+    json.dump(summary.report(), sys.stdout, indent=2)
+    print()
+    # Non-zero exit when any map has walkable tiles cut off from its spawn
+    sys.exit(1 if summary.failure_count else 0)
+
+
+if __name__ == "__main__":
+    main()
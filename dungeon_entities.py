@@ -0,0 +1,163 @@
+# Batched movement and wall collision for many entities (player plus monsters).
+#
+# EntityBatch keeps positions, radii and speeds as parallel arrays and advances
+# every entity in one call. The rules match RLDungeonGenerator.update_movement:
+# input is normalised, the x move is tried first and the y move second, and a
+# move is rejected when the entity's bounding box touches any non-walkable tile,
+# so entities slide along walls. With NumPy the box-vs-tile tests run as array
+# operations over the walkability mask; without it the same rules run per entity.
+from math import sqrt
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+
+class EntityBatch:
+    def __init__(self, dg, capacity=64):
+        self.dg = dg
+        self.tile_size = dg.tile_size
+        self.width = dg.width
+        self.height = dg.height
+        self.count = 0
+        self.refresh_mask()
+        if np is not None:
+            self.x = np.zeros(capacity)
+            self.y = np.zeros(capacity)
+            self.radius = np.zeros(capacity)
+            self.speed = np.zeros(capacity)
+        else:
+            self.x = []
+            self.y = []
+            self.radius = []
+            self.speed = []
+
+    def refresh_mask(self):
+        # Call after the map's tiles change
+        mask = self.dg.walkable_mask()
+        self.mask = np.frombuffer(mask, dtype=np.uint8).astype(bool) if np is not None else mask
+
+    def add(self, x, y, radius=6.0, speed=120.0):
+        # Returns the new entity's index
+        i = self.count
+        if np is not None:
+            if i == len(self.x):
+                grow = max(64, len(self.x))
+                self.x = np.concatenate((self.x, np.zeros(grow)))
+                self.y = np.concatenate((self.y, np.zeros(grow)))
+                self.radius = np.concatenate((self.radius, np.zeros(grow)))
+                self.speed = np.concatenate((self.speed, np.zeros(grow)))
+            self.x[i] = x
+            self.y[i] = y
+            self.radius[i] = radius
+            self.speed[i] = speed
+        else:
+            self.x.append(float(x))
+            self.y.append(float(y))
+            self.radius.append(float(radius))
+            self.speed.append(float(speed))
+        self.count += 1
+        return i
+
+    def add_player(self):
+        dg = self.dg
+        return self.add(dg.player_x, dg.player_y, dg.player_radius, dg.player_speed_pixels)
+
+    def apply_player(self, i):
+        # Copy entity i back onto the dungeon's player, updating fog of war
+        dg = self.dg
+        dg.player_x = float(self.x[i])
+        dg.player_y = float(self.y[i])
+        dg._update_tile_position()
+
+    def tile_positions(self):
+        # (rows, cols) of every entity, truncated like _update_tile_position
+        n = self.count
+        if np is not None:
+            return ((self.y[:n] / self.tile_size).astype(np.int64),
+                    (self.x[:n] / self.tile_size).astype(np.int64))
+        return ([int(y / self.tile_size) for y in self.y],
+                [int(x / self.tile_size) for x in self.x])
+
+    def step(self, delta_time, dx, dy):
+        # Advance every entity by delta_time. dx and dy are per-entity input
+        # vectors (sequences or arrays of length count).
+        if np is not None:
+            self._step_vectorized(delta_time, dx, dy)
+        else:
+            self._step_scalar(delta_time, dx, dy)
+
+    def _step_vectorized(self, delta_time, dx, dy):
+        n = self.count
+        dx = np.asarray(dx, dtype=float)[:n]
+        dy = np.asarray(dy, dtype=float)[:n]
+        # Same operation order as update_movement so results match bit for bit
+        length = np.sqrt(dx * dx + dy * dy)
+        length[length == 0.0] = 1.0
+        speed = self.speed[:n]
+        move_x = dx / length * speed * delta_time
+        move_y = dy / length * speed * delta_time
+
+        x = self.x[:n]
+        y = self.y[:n]
+        nx = x + move_x
+        ok = (move_x != 0.0) & self._can_move_to(nx, y, self.radius[:n])
+        x[ok] = nx[ok]
+        ny = y + move_y
+        ok = (move_y != 0.0) & self._can_move_to(x, ny, self.radius[:n])
+        y[ok] = ny[ok]
+
+    def _can_move_to(self, px, py, radius):
+        # Vectorized form of RLDungeonGenerator._can_move_to for every entity
+        ts = self.tile_size
+        min_col = np.trunc((px - radius) / ts).astype(np.int64)
+        max_col = np.trunc((px + radius) / ts).astype(np.int64)
+        min_row = np.trunc((py - radius) / ts).astype(np.int64)
+        max_row = np.trunc((py + radius) / ts).astype(np.int64)
+        ok = np.ones(len(px), dtype=bool)
+        if len(px) == 0:
+            return ok
+        # Boxes smaller than a tile cover at most 2x2 tiles, but handle any size
+        span_rows = int((max_row - min_row).max()) + 1
+        span_cols = int((max_col - min_col).max()) + 1
+        for dr in range(span_rows):
+            rows = min_row + dr
+            row_used = rows <= max_row
+            for dc in range(span_cols):
+                cols = min_col + dc
+                used = row_used & (cols <= max_col)
+                inside = (rows >= 0) & (cols >= 0) & (rows < self.height) & (cols < self.width)
+                index = np.where(inside, rows * self.width + cols, 0)
+                walkable = inside & self.mask[index]
+                ok &= walkable | ~used
+        return ok
+
+    def _step_scalar(self, delta_time, dx, dy):
+        for i in range(self.count):
+            ix = dx[i]
+            iy = dy[i]
+            if ix != 0.0 or iy != 0.0:
+                length = sqrt(ix * ix + iy * iy)
+                ix /= length
+                iy /= length
+            move_x = ix * self.speed[i] * delta_time
+            move_y = iy * self.speed[i] * delta_time
+            if move_x != 0.0:
+                nx = self.x[i] + move_x
+                if self._can_move_to_scalar(nx, self.y[i], self.radius[i]):
+                    self.x[i] = nx
+            if move_y != 0.0:
+                ny = self.y[i] + move_y
+                if self._can_move_to_scalar(self.x[i], ny, self.radius[i]):
+                    self.y[i] = ny
+
+    def _can_move_to_scalar(self, px, py, radius):
+        ts = self.tile_size
+        for r in range(int((py - radius) / ts), int((py + radius) / ts) + 1):
+            if r < 0 or r >= self.height:
+                return False
+            for c in range(int((px - radius) / ts), int((px + radius) / ts) + 1):
+                if c < 0 or c >= self.width or not self.mask[r * self.width + c]:
+                    return False
+        return True
@@ -0,0 +1,124 @@
+# Headless export of generated maps as JSONL or packed binary records.
+#
+# Everything here works on iterables of generated maps (for example the output
+# of RLDungeonGenerator.generate_batch) and produces records lazily, so large
+# runs can stream straight to disk.
+import json
+import struct
+
+EXPORT_FORMATS = ('jsonl', 'packed', 'geometry')
+EXPORT_BUFFER_SIZE = 1 << 20
+
+# Packed record: header followed by width * height raw tile bytes, row-major.
+# Seed is -1 when the map was generated from an unseeded or shared RNG.
+PACKED_MAGIC = b'RLDM'
+PACKED_VERSION = 1
+PACKED_HEADER = struct.Struct('<4sBxxxIIqII')
+# Explicit seeds must fit the signed 64-bit header field and not be -1
+SEED_LIMIT = 1 << 63
+
+def map_record(dg):
+    return {
+        'seed': dg.seed,
+        'width': dg.width,
+        'height': dg.height,
+        'spawn': [dg.player_row, dg.player_col],
+        'rooms': [[room.row, room.col, room.height, room.width] for room in dg.rooms],
+        'leaves': [list(leaf) for leaf in dg.leaves],
+        'doors': [list(door) for door in dg.door_positions()],
+        'tiles': list(dg.map_rows()),
+    }
+
+def iter_jsonl_records(maps):
+    for dg in maps:
+        yield json.dumps(map_record(dg), separators=(',', ':')) + '\n'
+
+def geometry_record(dg):
+    # Rooms and corridors only, enough for RLDungeonGenerator.dungeon_from_geometry
+    # to rasterize the map again; a fraction of the size of the tiles
+    return {
+        'seed': dg.seed,
+        'width': dg.width,
+        'height': dg.height,
+        'rooms': [[room.row, room.col, room.height, room.width] for room in dg.rooms],
+        'corridors': [[c.kind, c.line, c.start, c.end] for c in dg.corridors],
+        'links': [list(link) for link in dg.room_links],
+    }
+
+def iter_geometry_records(maps):
+    for dg in maps:
+        yield json.dumps(geometry_record(dg), separators=(',', ':')) + '\n'
+
+def read_geometry(fp):
+    # Stream geometry records back out of a file written with the 'geometry' format
+    for line in fp:
+        if line.strip():
+            yield json.loads(line)
+
+def encode_packed(dg):
+    seed = dg.seed if dg.seed is not None else -1
+    header = PACKED_HEADER.pack(PACKED_MAGIC, PACKED_VERSION, dg.width, dg.height,
+                                seed, dg.player_row, dg.player_col)
+    return header + bytes(dg.tiles)
+
+def iter_packed_records(maps):
+    for dg in maps:
+        yield encode_packed(dg)
+
+def decode_packed(buf, offset=0):
+    # Returns (info dict, tile bytes, offset of the next record)
+    magic, version, width, height, seed, spawn_row, spawn_col = PACKED_HEADER.unpack_from(buf, offset)
+    if magic != PACKED_MAGIC:
+        raise ValueError('not a packed dungeon record')
+    if version != PACKED_VERSION:
+        raise ValueError(f'unsupported packed record version {version}')
+    start = offset + PACKED_HEADER.size
+    end = start + width * height
+    if end > len(buf):
+        raise ValueError('truncated packed dungeon record')
+    info = {
+        'seed': seed if seed != -1 else None,
+        'width': width,
+        'height': height,
+        'spawn': (spawn_row, spawn_col),
+    }
+    return info, bytes(buf[start:end]), end
+
+def read_packed(fp):
+    # Stream (info, tiles) pairs back out of a file of packed records
+    while True:
+        header = fp.read(PACKED_HEADER.size)
+        if not header:
+            return
+        if len(header) < PACKED_HEADER.size:
+            raise ValueError('truncated packed dungeon record')
+        _, _, width, height, _, _, _ = PACKED_HEADER.unpack(header)
+        info, tiles, _ = decode_packed(header + fp.read(width * height))
+        yield info, tiles
+
+def export_maps(maps, fp, fmt):
+    # Write every map to the binary file object fp, batching small records into
+    # large writes. Returns the number of maps written.
+    if fmt == 'jsonl':
+        records = (line.encode('utf-8') for line in iter_jsonl_records(maps))
+    elif fmt == 'packed':
+        records = iter_packed_records(maps)
+    elif fmt == 'geometry':
+        records = (line.encode('utf-8') for line in iter_geometry_records(maps))
+    else:
+        raise ValueError(f'unknown export format {fmt!r}')
+
+    count = 0
+    pending = []
+    pending_size = 0
+    for record in records:
+        pending.append(record)
+        pending_size += len(record)
+        count += 1
+        if pending_size >= EXPORT_BUFFER_SIZE:
+            fp.write(b''.join(pending))
+            pending = []
+            pending_size = 0
+    if pending:
+        fp.write(b''.join(pending))
+    return count
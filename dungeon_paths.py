@@ -0,0 +1,253 @@
+# Shared distance maps ("flow fields") for moving many agents over a dungeon.
+#
+# Instead of one A* search per monster per tick, a DistanceMap is computed once
+# from a set of goal tiles with a multi-source breadth-first search, and every
+# agent simply steps to a neighbouring tile with a smaller distance.
+# DistanceMapService caches fields by goal set, rebuilding the player field
+# only when the player changes tile. For long trips it routes over the room
+# graph built from connect_rooms' corridors and follows a cached field to the
+# next room on the route.
+from array import array
+from collections import OrderedDict
+from heapq import heappop
+from heapq import heappush
+
+from RLDungeonGenerator import NO_ROOM
+
+UNREACHABLE = -1
+
+
+def padded_mask(dg):
+    # Walkable mask with a wall column after every row and a wall row above and
+    # below the map. Neighbours are then always i - 1, i + 1, i - stride and
+    # i + stride with no bounds checks.
+    mask = dg.walkable_mask()
+    stride = dg.width + 1
+    rows = [mask[i:i + dg.width] for i in range(0, dg.width * dg.height, dg.width)]
+    padded = bytes(stride) + b'\x00'.join(rows) + bytes(stride + 1)
+    return padded, stride
+
+
+class DistanceMap:
+    # Steps from every tile to the nearest goal, 4-connected. Distances live in
+    # one flat int array over the padded grid; UNREACHABLE marks walls and tiles
+    # cut off from every goal (or beyond max_distance).
+    def __init__(self, mask, stride, width, height, goals, max_distance=None):
+        self.stride = stride
+        self.width = width
+        self.height = height
+        self.goals = frozenset(goals)
+        dist = array('i', [UNREACHABLE]) * len(mask)
+
+        frontier = []
+        for r, c in self.goals:
+            if 0 <= r < height and 0 <= c < width:
+                i = self._index(r, c)
+                if mask[i] and dist[i] == UNREACHABLE:
+                    dist[i] = 0
+                    frontier.append(i)
+
+        step = 0
+        while frontier and (max_distance is None or step < max_distance):
+            step += 1
+            next_frontier = []
+            append = next_frontier.append
+            for i in frontier:
+                j = i - 1
+                if mask[j] and dist[j] == UNREACHABLE:
+                    dist[j] = step
+                    append(j)
+                j = i + 1
+                if mask[j] and dist[j] == UNREACHABLE:
+                    dist[j] = step
+                    append(j)
+                j = i - stride
+                if mask[j] and dist[j] == UNREACHABLE:
+                    dist[j] = step
+                    append(j)
+                j = i + stride
+                if mask[j] and dist[j] == UNREACHABLE:
+                    dist[j] = step
+                    append(j)
+            frontier = next_frontier
+
+        self.dist = dist
+
+    def _index(self, r, c):
+        return (r + 1) * self.stride + c
+
+    def distance(self, r, c):
+        if r < 0 or c < 0 or r >= self.height or c >= self.width:
+            return UNREACHABLE
+        return self.dist[self._index(r, c)]
+
+    def next_step(self, r, c):
+        # Neighbouring tile one step closer to a goal, or (r, c) itself when
+        # already on a goal or unable to reach one
+        here = self.distance(r, c)
+        if here <= 0:
+            return (r, c)
+        i = self._index(r, c)
+        dist = self.dist
+        for j in (i - self.stride, i + 1, i + self.stride, i - 1):
+            if dist[j] == here - 1:
+                row, col = divmod(j, self.stride)
+                return (row - 1, col)
+        return (r, c)
+
+    def next_steps(self, positions):
+        # Batch form of next_step for many agents sharing this field
+        return [self.next_step(r, c) for r, c in positions]
+
+
+class RoomGraph:
+    # Rooms as nodes and connect_rooms' corridors as edges, weighted by the
+    # distance between room centres.
+    def __init__(self, dg):
+        self.rooms = dg.rooms
+        self.neighbours = [[] for _ in dg.rooms]
+        for i, j in dg.room_links:
+            weight = dg.distance_between_rooms(dg.rooms[i], dg.rooms[j])
+            self.neighbours[i].append((j, weight))
+            self.neighbours[j].append((i, weight))
+
+    def route(self, start, goal):
+        # Room indexes from start to goal inclusive (Dijkstra), or None if the
+        # rooms are not connected
+        if start == goal:
+            return [start]
+        best = {start: 0.0}
+        previous = {}
+        heap = [(0.0, start)]
+        while heap:
+            cost, room = heappop(heap)
+            if room == goal:
+                path = [goal]
+                while path[-1] != start:
+                    path.append(previous[path[-1]])
+                path.reverse()
+                return path
+            if cost > best[room]:
+                continue
+            for other, weight in self.neighbours[room]:
+                new_cost = cost + weight
+                if new_cost < best.get(other, float('inf')):
+                    best[other] = new_cost
+                    previous[other] = room
+                    heappush(heap, (new_cost, other))
+        return None
+
+    def next_rooms_toward(self, goal):
+        # Shortest-path tree rooted at goal: for each room, the next room on its
+        # way to goal (goal maps to itself, unreachable rooms are absent)
+        best = {goal: 0.0}
+        toward = {goal: goal}
+        heap = [(0.0, goal)]
+        while heap:
+            cost, room = heappop(heap)
+            if cost > best[room]:
+                continue
+            for other, weight in self.neighbours[room]:
+                new_cost = cost + weight
+                if new_cost < best.get(other, float('inf')):
+                    best[other] = new_cost
+                    toward[other] = room
+                    heappush(heap, (new_cost, other))
+        return toward
+
+    def link_reach(self):
+        # Upper bound on the walk between two linked rooms, used to bound the
+        # search when building a field toward one room
+        reach = 0
+        for i, others in enumerate(self.neighbours):
+            a = self.rooms[i]
+            for j, _ in others:
+                b = self.rooms[j]
+                span = (abs(a.row - b.row) + abs(a.col - b.col) +
+                        a.height + a.width + b.height + b.width)
+                reach = max(reach, span)
+        return reach
+
+
+class DistanceMapService:
+    # Cache of DistanceMaps for one dungeon, shared by every agent on it.
+    #
+    #   fields = DistanceMapService(dg)
+    #   toward_player = fields.player_field()      # recomputed only on tile change
+    #   monster_row, monster_col = toward_player.next_step(monster_row, monster_col)
+    def __init__(self, dg, max_fields=256):
+        self.dg = dg
+        self.max_fields = max_fields
+        self.fields = OrderedDict()
+        self.routes = OrderedDict()
+        self.refresh()
+
+    def refresh(self):
+        # Call after tiles change (doors opening, walls dug) to drop stale fields
+        self.mask, self.stride = padded_mask(self.dg)
+        self.fields.clear()
+        self.routes.clear()
+        self.room_graph = RoomGraph(self.dg)
+        self.room_reach = self.room_graph.link_reach()
+        self._player_key = None
+        self._player_field = None
+
+    def _cached(self, key, goals, max_distance=None):
+        field = self.fields.get(key)
+        if field is not None:
+            self.fields.move_to_end(key)
+            return field
+        field = DistanceMap(self.mask, self.stride, self.dg.width, self.dg.height, goals, max_distance)
+        self.fields[key] = field
+        while len(self.fields) > self.max_fields:
+            self.fields.popitem(last=False)
+        return field
+
+    def field_to(self, goals, max_distance=None):
+        goals = frozenset(goals)
+        return self._cached((goals, max_distance), goals, max_distance)
+
+    def player_field(self, max_distance=None):
+        key = (self.dg.player_row, self.dg.player_col, max_distance)
+        if key != self._player_key:
+            self._player_field = DistanceMap(self.mask, self.stride, self.dg.width, self.dg.height,
+                                             [key[:2]], max_distance)
+            self._player_key = key
+        return self._player_field
+
+    def room_field(self, room_id):
+        # Field toward every tile of a room, shared by all agents heading there.
+        # It only needs to cover the rooms linked to this one, so the search
+        # stops after room_reach steps.
+        key = ('room', room_id)
+        if key in self.fields:
+            self.fields.move_to_end(key)
+            return self.fields[key]
+        room = self.dg.rooms[room_id]
+        goals = [(r, c) for r in range(room.row, room.row + room.height)
+                        for c in range(room.col, room.col + room.width)]
+        return self._cached(key, goals, self.room_reach)
+
+    def next_rooms_toward(self, goal_room):
+        toward = self.routes.get(goal_room)
+        if toward is None:
+            toward = self.room_graph.next_rooms_toward(goal_room)
+            self.routes[goal_room] = toward
+            while len(self.routes) > self.max_fields:
+                self.routes.popitem(last=False)
+        else:
+            self.routes.move_to_end(goal_room)
+        return toward
+
+    def step_toward(self, r, c, goal_row, goal_col):
+        # Hierarchical step for long-range travel: when both ends are in rooms,
+        # follow the room route and head for the next room on it; the last leg
+        # (or any trip touching a corridor) uses a field to the goal tile itself.
+        dg = self.dg
+        here = dg.room_at(r, c)
+        there = dg.room_at(goal_row, goal_col)
+        if here != NO_ROOM and there != NO_ROOM and here != there:
+            next_room = self.next_rooms_toward(there).get(here)
+            if next_room is not None and next_room != there:
+                return self.room_field(next_room).next_step(r, c)
+        return self.field_to([(goal_row, goal_col)]).next_step(r, c)
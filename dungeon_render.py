@@ -0,0 +1,448 @@
+# Windowed rendering with tcod: the viewport renderer, the fixed-timestep game
+# loop and tileset loading.
+#
+# RLDungeonGenerator imports this module only when a window is opened, so
+# --ascii, batch and export runs never pay for importing tcod or NumPy.
+# Decoded tilesets are cached as raw RGBA tiles keyed by a hash of the source
+# file and the loading parameters, so later launches skip PNG decoding and
+# TrueType rasterization.
+from collections import deque
+import hashlib
+import os
+import struct
+import sys
+import time
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+try:
+    import tcod
+    import tcod.tileset
+except Exception:
+    tcod = None
+
+from RLDungeonGenerator import DOOR
+from RLDungeonGenerator import FLOOR
+from RLDungeonGenerator import WALL
+from RLDungeonGenerator import RLDungeonGenerator
+
+PNG_TILESET_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'assets', 'tilesets', 'Redjack17.png')
+TTF_PATHS = [
+    os.path.join(os.environ.get('WINDIR', 'C:\\Windows'), 'Fonts', 'consola.ttf'),
+    os.path.join(os.environ.get('WINDIR', 'C:\\Windows'), 'Fonts', 'consolab.ttf'),
+]
+TILE_SIZE = 16
+
+# Tileset cache file: header, count uint32 codepoints, then count tiles of
+# tile_height * tile_width RGBA bytes each, row-major
+TILESET_MAGIC = b'RLTS'
+TILESET_VERSION = 1
+TILESET_HEADER = struct.Struct('<4sHHHxxI')
+TILESET_SUFFIX = '.tiles'
+
+
+def tileset_cache_dir():
+    # RLDUNGEON_CACHE_DIR overrides the per-user cache location
+    base = os.environ.get('XDG_CACHE_HOME') or os.path.join(os.path.expanduser('~'), '.cache')
+    return os.environ.get('RLDUNGEON_CACHE_DIR') or os.path.join(base, 'RLDungeonGenerator')
+
+
+def tileset_cache_path(source_path, *params):
+    # Cache file for a tileset decoded from source_path with the given loader
+    # parameters (kind, tile size, grid...), keyed by the file's contents
+    digest = hashlib.sha256()
+    with open(source_path, 'rb') as fp:
+        digest.update(fp.read())
+    digest.update(repr((TILESET_VERSION,) + params).encode('utf-8'))
+    return os.path.join(tileset_cache_dir(), digest.hexdigest()[:32] + TILESET_SUFFIX)
+
+
+def save_tileset(tileset, codepoints, path):
+    # Write atomically so a concurrent launch never reads a partial file
+    codepoints = list(dict.fromkeys(codepoints))
+    tiles = np.stack([tileset.get_tile(cp) for cp in codepoints]).astype(np.uint8)
+    header = TILESET_HEADER.pack(TILESET_MAGIC, TILESET_VERSION, tileset.tile_width,
+                                 tileset.tile_height, len(codepoints))
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    with open(tmp_path, 'wb') as fp:
+        fp.write(header)
+        fp.write(np.array(codepoints, dtype='<u4').tobytes())
+        fp.write(tiles.tobytes())
+    os.replace(tmp_path, path)
+
+
+def load_saved_tileset(path):
+    with open(path, 'rb') as fp:
+        data = fp.read()
+    if len(data) < TILESET_HEADER.size:
+        raise ValueError(f"{path} is not a tileset cache file")
+    magic, version, tile_width, tile_height, count = TILESET_HEADER.unpack_from(data)
+    if magic != TILESET_MAGIC or version != TILESET_VERSION:
+        raise ValueError(f"{path} is not a version {TILESET_VERSION} tileset cache file")
+    start = TILESET_HEADER.size
+    tiles_start = start + 4 * count
+    if len(data) != tiles_start + count * tile_height * tile_width * 4:
+        raise ValueError(f"{path} is truncated")
+    codepoints = np.frombuffer(data, dtype='<u4', count=count, offset=start)
+    tiles = np.frombuffer(data, dtype=np.uint8, offset=tiles_start).reshape(count, tile_height, tile_width, 4)
+    tileset = tcod.tileset.Tileset(tile_width, tile_height)
+    for cp, tile in zip(codepoints.tolist(), tiles):
+        tileset.set_tile(cp, tile)
+    return tileset
+
+
+def cached_tileset(source_path, params, load):
+    # The tileset load() would build from source_path, from the cache when present
+    path = tileset_cache_path(source_path, *params)
+    try:
+        return load_saved_tileset(path)
+    except (OSError, ValueError):
+        pass
+    tileset = load()
+    try:
+        save_tileset(tileset, tcod.tileset.CHARMAP_CP437, path)
+    except OSError:
+        pass
+    return tileset
+
+
+def load_tileset():
+    # Prefer the project-local bitmap tileset (a CP437 16x16 grid tilesheet),
+    # then a TrueType font from system Consolas. None if neither loads.
+    if os.path.exists(PNG_TILESET_PATH):
+        try:
+            return cached_tileset(PNG_TILESET_PATH, ('sheet', 16, 16),
+                                  lambda: tcod.tileset.load_tilesheet(PNG_TILESET_PATH, 16, 16, tcod.tileset.CHARMAP_CP437))
+        except Exception:
+            pass
+
+    for path in TTF_PATHS:
+        if os.path.exists(path):
+            try:
+                return cached_tileset(path, ('truetype', TILE_SIZE),
+                                      lambda: tcod.tileset.load_truetype_font(path, TILE_SIZE, tcod.tileset.CHARMAP_CP437))
+            except Exception:
+                continue
+    return None
+
+
+# Colors per tile code as (fg, bg); any other code is drawn as its own glyph in white
+TILE_COLORS = {
+    WALL: ((125, 125, 125), (10, 10, 10)),
+    # Brighter, slightly bluish floor with lighter background
+    FLOOR: ((200, 210, 235), (35, 40, 55)),
+    DOOR: ((255, 215, 0), (0, 0, 0)),
+}
+FOG_DIM = 0.15
+PLAYER_GLYPH = ord('@')
+PLAYER_COLOR = (255, 255, 255)
+
+_tile_lut_cache = {}
+
+def tile_lut(dtype):
+    # Lookup table indexed by tile code + 256 * explored, holding ready-made
+    # console cells (ch, fg, bg). Unexplored cells get dimmed fg and black bg.
+    lut = _tile_lut_cache.get(dtype)
+    if lut is None:
+        lut = np.zeros(512, dtype=dtype)
+        for code in range(256):
+            fg, bg = TILE_COLORS.get(code, ((255, 255, 255), (0, 0, 0)))
+            lut[code + 256] = (code, fg, bg)
+            lut[code] = (code, tuple(int(v * FOG_DIM) for v in fg), (0, 0, 0))
+        _tile_lut_cache[dtype] = lut
+    return lut
+
+def camera_origin(dg, view_w, view_h):
+    # Camera uses logical tile position (not visual) to prevent jiggling
+    # This keeps the map stable while only the player moves smoothly
+    cam_y = int(dg.player_y / dg.tile_size) - view_h // 2
+    cam_x = int(dg.player_x / dg.tile_size) - view_w // 2
+    if cam_y > dg.height - view_h: cam_y = dg.height - view_h
+    if cam_x > dg.width - view_w: cam_x = dg.width - view_w
+    if cam_y < 0: cam_y = 0
+    if cam_x < 0: cam_x = 0
+    return cam_y, cam_x
+
+def player_cell(dg, cam_y, cam_x):
+    # Position is derived from pixel coords to allow sub-tile movement feel.
+    pr = int(round(dg.player_y / dg.tile_size)) - cam_y
+    pc = int(round(dg.player_x / dg.tile_size)) - cam_x
+    return pr, pc
+
+def draw_frame(console, dg: RLDungeonGenerator) -> None:
+    # Draw the viewport around the player into an order="F" console; one full
+    # frame of the tcod loop. Cells come from the lookup table in one
+    # vectorized gather instead of a console.print per tile.
+    view_w = console.width
+    view_h = console.height
+    cam_y, cam_x = camera_origin(dg, view_w, view_h)
+    h = min(view_h, dg.height - cam_y)
+    w = min(view_w, dg.width - cam_x)
+
+    tiles, explored = dg.viewport(cam_y, cam_x, h, w)
+    key = np.frombuffer(tiles, dtype=np.uint8).reshape(h, w).astype(np.uint16)
+    key[np.frombuffer(explored, dtype=np.uint8).reshape(h, w) != 0] += 256
+
+    rgb = console.rgb
+    if h < view_h or w < view_w:
+        console.clear()
+    # Console arrays are indexed [x, y] in Fortran order
+    rgb[:w, :h] = tile_lut(rgb.dtype)[key.T]
+
+    # Draw the player as a sprite-like glyph on top of non-wall tiles.
+    pr, pc = player_cell(dg, cam_y, cam_x)
+    if 0 <= pr < view_h and 0 <= pc < view_w:
+        rgb["ch"][pc, pr] = PLAYER_GLYPH
+        rgb["fg"][pc, pr] = PLAYER_COLOR
+
+
+class ViewportRenderer:
+    # Redraws the console only when something visible changed: the camera, the
+    # player's drawn cell, the explored mask or the map itself.
+    def __init__(self):
+        self.last_state = None
+
+    def invalidate(self):
+        self.last_state = None
+
+    def draw(self, console, dg) -> bool:
+        cam_y, cam_x = camera_origin(dg, console.width, console.height)
+        state = (id(dg), cam_y, cam_x, player_cell(dg, cam_y, cam_x), dg.explored_version)
+        if state == self.last_state:
+            return False
+        draw_frame(console, dg)
+        self.last_state = state
+        return True
+
+
+# Simulation runs in fixed steps of SIM_STEP seconds; at most MAX_SIM_STEPS are
+# caught up per frame so a stall never turns into a burst of movement. An idle
+# loop blocks on input for up to IDLE_TIMEOUT seconds at a time.
+SIM_STEP = 1.0 / 60.0
+MAX_SIM_STEPS = 6
+IDLE_TIMEOUT = 0.5
+
+class FixedTimestep:
+    # Turns wall-clock time into a whole number of fixed simulation steps,
+    # independent of how often frames are drawn.
+    def __init__(self, step=SIM_STEP, max_steps=MAX_SIM_STEPS):
+        self.step = step
+        self.max_steps = max_steps
+        self.last = None
+        self.accumulator = 0.0
+        self.pause()
+
+    def pause(self):
+        # Forget elapsed time (the loop was idle). The first step after
+        # resuming is due immediately so input responds at once.
+        self.last = None
+        self.accumulator = self.step
+
+    def advance(self, now):
+        # Steps to simulate at time now (seconds, monotonic)
+        if self.last is not None:
+            self.accumulator += now - self.last
+        self.last = now
+        steps = int(self.accumulator / self.step)
+        if steps > self.max_steps:
+            self.accumulator = 0.0
+            return self.max_steps
+        self.accumulator -= steps * self.step
+        return steps
+
+    def time_to_next_step(self):
+        return max(0.0, self.step - self.accumulator)
+
+
+class LoopStats:
+    # Frame pacing and CPU use of the game loop. Frame times are the wall time
+    # between iterations of the active (not idle) loop, the last `window` of
+    # them kept; presents counts frames that actually changed. CPU use is
+    # process time over wall time since the loop started, so an idle window
+    # reads near zero.
+    def __init__(self, window=600):
+        self.frame_times = deque(maxlen=window)
+        self.frames = 0
+        self.presents = 0
+        self.steps = 0
+        self.idle_waits = 0
+        self.start_wall = time.perf_counter()
+        self.start_cpu = time.process_time()
+        self.last_frame = None
+
+    def frame(self):
+        now = time.perf_counter()
+        if self.last_frame is not None:
+            self.frame_times.append(now - self.last_frame)
+        self.last_frame = now
+        self.frames += 1
+
+    def presented(self):
+        self.presents += 1
+
+    def simulated(self, steps):
+        self.steps += steps
+
+    def idle(self):
+        self.idle_waits += 1
+        # A gap spent idle is not a slow frame
+        self.last_frame = None
+
+    def summary(self):
+        wall = time.perf_counter() - self.start_wall
+        cpu = time.process_time() - self.start_cpu
+        times = sorted(self.frame_times)
+        result = {
+            'wall_seconds': wall,
+            'cpu_seconds': cpu,
+            'cpu_percent': 100.0 * cpu / wall if wall > 0 else 0.0,
+            'frames': self.frames,
+            'presents': self.presents,
+            'simulation_steps': self.steps,
+            'idle_waits': self.idle_waits,
+        }
+        if times:
+            result['frame_ms_p50'] = 1000.0 * times[len(times) // 2]
+            result['frame_ms_p95'] = 1000.0 * times[min(len(times) - 1, len(times) * 95 // 100)]
+            result['frame_ms_max'] = 1000.0 * times[-1]
+        return result
+
+    def report(self):
+        lines = []
+        for name, value in self.summary().items():
+            if isinstance(value, int):
+                lines.append(f"{name:>20} {value:10d}")
+            else:
+                lines.append(f"{name:>20} {value:10.3f}")
+        return '\n'.join(lines)
+
+
+def simulate_step(dg, held_directions, step):
+    # One fixed step of player movement from the held direction keys
+    input_dx = 0.0
+    input_dy = 0.0
+    for direction in held_directions:
+        input_dx += direction[0]
+        input_dy += direction[1]
+    start_x = dg.player_x
+    start_y = dg.player_y
+    dg.update_movement(step, (input_dx, input_dy))
+    # Only when a wall stopped part of the move, drop the held directions that
+    # are blocked so the remaining ones keep full speed
+    if (input_dx != 0.0 and dg.player_x == start_x) or (input_dy != 0.0 and dg.player_y == start_y):
+        for direction in list(held_directions):
+            test_x = dg.player_x + direction[0] * dg.player_radius
+            test_y = dg.player_y + direction[1] * dg.player_radius
+            if not dg._can_move_to(test_x, test_y):
+                held_directions.remove(direction)
+
+
+def render_with_tcod(dg: RLDungeonGenerator, levels=None, stats=None, max_frames=None) -> RLDungeonGenerator:
+    # Returns the map being played on exit. With a LevelManager, '>' moves to
+    # the next level, which is generated in the background meanwhile. A
+    # LoopStats passed as stats records frame pacing and CPU use. max_frames
+    # closes the window after that many loop iterations; the first always
+    # presents, so max_frames=1 times startup to the first visible frame.
+    if tcod is None:
+        print("tcod is not installed. Install requirements and try again.")
+        sys.exit(1)
+
+    tileset = load_tileset()
+    if tileset is None:
+        print("Could not load a TrueType font from system. Falling back to ASCII output. Run with --ascii to skip this attempt.")
+        dg.print_map()
+        return dg
+
+    # Viewport size (camera window). Smaller than full map = zoomed-in view.
+    view_w = min(40, dg.width)
+    view_h = min(25, dg.height)
+    console = tcod.console.Console(view_w, view_h, order="F")
+    movement_key_map = {
+        tcod.event.K_UP: (0.0, -1.0),
+        tcod.event.K_w: (0.0, -1.0),
+        tcod.event.K_KP_8: (0.0, -1.0),
+        tcod.event.K_DOWN: (0.0, 1.0),
+        tcod.event.K_s: (0.0, 1.0),
+        tcod.event.K_KP_2: (0.0, 1.0),
+        tcod.event.K_LEFT: (-1.0, 0.0),
+        tcod.event.K_a: (-1.0, 0.0),
+        tcod.event.K_KP_4: (-1.0, 0.0),
+        tcod.event.K_RIGHT: (1.0, 0.0),
+        tcod.event.K_d: (1.0, 0.0),
+        tcod.event.K_KP_6: (1.0, 0.0),
+    }
+    held_directions = []
+    renderer = ViewportRenderer()
+    scheduler = FixedTimestep()
+    frames = 0
+
+    with tcod.context.new(
+        columns=view_w,
+        rows=view_h,
+        tileset=tileset,
+        title="RLDungeonGenerator",
+        vsync=True,
+    ) as context:
+        while True:
+            if held_directions:
+                events = tcod.event.get()
+            else:
+                # Nothing to simulate: block until input arrives, without
+                # counting the wait as simulation time
+                scheduler.pause()
+                if stats is not None:
+                    stats.idle()
+                events = tcod.event.wait(IDLE_TIMEOUT)
+
+            for event in events:
+                if event.type == "QUIT":
+                    return dg
+                if isinstance(event, tcod.event.WindowEvent):
+                    # Exposed/resized windows need the last frame presented again
+                    renderer.invalidate()
+                if event.type == "KEYDOWN":
+                    if event.sym == tcod.event.K_ESCAPE:
+                        return dg
+                    if levels is not None and event.sym in (tcod.event.K_GREATER, tcod.event.K_PERIOD):
+                        dg = levels.advance()
+                        held_directions.clear()
+                        continue
+                    # Track held movement keys for continuous travel
+                    direction = movement_key_map.get(event.sym)
+                    if direction is not None:
+                        if direction in held_directions:
+                            held_directions.remove(direction)
+                        held_directions.insert(0, direction)
+                if event.type == "KEYUP":
+                    direction = movement_key_map.get(event.sym)
+                    if direction is not None and direction in held_directions:
+                        held_directions.remove(direction)
+
+            # Steps the scheduler owes are only simulated while a key is held;
+            # stats count the ones that actually ran
+            simulated = 0
+            for _ in range(scheduler.advance(time.perf_counter())):
+                if not held_directions:
+                    break
+                simulate_step(dg, held_directions, scheduler.step)
+                simulated += 1
+            if stats is not None:
+                stats.frame()
+                stats.simulated(simulated)
+
+            if renderer.draw(console, dg):
+                context.present(console)
+                if stats is not None:
+                    stats.presented()
+            frames += 1
+            if max_frames is not None and frames >= max_frames:
+                return dg
+
+            if held_directions:
+                # Pace the loop to the simulation rate when vsync has not
+                # already waited (or nothing needed presenting)
+                time.sleep(scheduler.time_to_next_step())
@@ -0,0 +1,221 @@
+# Local map generation service for tools that need the same maps over and over.
+#
+# A small asyncio HTTP/1.1 server (TCP on localhost or a Unix socket) that
+# generates maps on a process pool and answers with the packed record format
+# from dungeon_export. Finished records are kept in an LRU cache bounded by
+# total bytes, and concurrent requests for the same map share one generation.
+#
+#   python RLDungeonGenerator.py --serve --port 8765
+#   curl 'http://127.0.0.1:8765/map?seed=42&width=75&height=40' > map.bin
+#   curl 'http://127.0.0.1:8765/stats'
+#
+# GET /map takes seed, width and height plus the optional generation params
+# min_rooms, max_corridor (try consecutive seeds until a layout qualifies; the
+# record's header holds the seed used) and split_depth (parallel subtrees).
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
+from urllib.parse import parse_qsl
+from urllib.parse import urlsplit
+import asyncio
+import json
+import os
+import signal
+
+from RLDungeonGenerator import generate_constrained_map
+from RLDungeonGenerator import generate_parallel_map
+from RLDungeonGenerator import generate_seeded_map
+from dungeon_export import SEED_LIMIT
+from dungeon_export import encode_packed
+
+DEFAULT_PORT = 8765
+DEFAULT_CACHE_BYTES = 256 << 20
+# Largest map served, in tiles
+MAX_TILES = 4096 * 4096
+PARAMS = ('min_rooms', 'max_corridor', 'split_depth')
+ATTEMPTS = 1000
+REASONS = {200: 'OK', 400: 'Bad Request', 404: 'Not Found', 405: 'Method Not Allowed', 500: 'Internal Server Error'}
+
+
+def generate_packed(width, height, seed, params):
+    # Runs in a worker process; only the packed bytes travel back
+    if params.get('split_depth'):
+        dg = generate_parallel_map(width, height, seed, params['split_depth'], workers=1)
+    elif params.get('min_rooms') or params.get('max_corridor') is not None:
+        dg = generate_constrained_map(width, height, range(seed, seed + ATTEMPTS),
+                                      params.get('min_rooms', 0), params.get('max_corridor'))
+        if dg is None:
+            raise ValueError(f"no layout in {ATTEMPTS} seeds from {seed} meets the constraints")
+    else:
+        dg = generate_seeded_map(width, height, seed)
+    return encode_packed(dg)
+
+
+def parse_map_query(query):
+    # (width, height, seed, params) from a /map query string; ValueError if invalid
+    fields = dict(parse_qsl(query))
+    try:
+        seed = int(fields.pop('seed'))
+        width = int(fields.pop('width', 75))
+        height = int(fields.pop('height', 40))
+        params = {name: int(fields.pop(name)) for name in PARAMS if name in fields}
+    except KeyError:
+        raise ValueError("seed is required")
+    except ValueError:
+        raise ValueError("seed, width, height and params must be integers")
+    if fields:
+        raise ValueError(f"unknown parameters: {', '.join(sorted(fields))}")
+    # The record header stores the seed signed, with -1 meaning none; a
+    # constrained search also uses the seeds after it
+    last_seed = seed + (ATTEMPTS - 1 if params.get('min_rooms') or 'max_corridor' in params else 0)
+    if seed < 0 or last_seed >= SEED_LIMIT:
+        raise ValueError(f"seed must lie between 0 and {SEED_LIMIT - 1}")
+    if width < 8 or height < 8 or width * height > MAX_TILES:
+        raise ValueError(f"width and height must be at least 8 and at most {MAX_TILES} tiles in total")
+    return width, height, seed, params
+
+
+class GenerationService:
+    def __init__(self, workers=None, cache_bytes=DEFAULT_CACHE_BYTES):
+        self.pool = ProcessPoolExecutor(workers or os.cpu_count() or 1)
+        self.cache = OrderedDict()
+        self.cache_bytes = cache_bytes
+        self.cached_bytes = 0
+        self.in_flight = {}
+        self.counters = {'requests': 0, 'hits': 0, 'joined': 0, 'generated': 0, 'errors': 0}
+
+    async def get_map(self, width, height, seed, params):
+        key = (width, height, seed, tuple(sorted(params.items())))
+        self.counters['requests'] += 1
+        record = self.cache.get(key)
+        if record is not None:
+            self.cache.move_to_end(key)
+            self.counters['hits'] += 1
+            return record
+
+        future = self.in_flight.get(key)
+        if future is not None:
+            self.counters['joined'] += 1
+        else:
+            loop = asyncio.get_running_loop()
+            future = loop.run_in_executor(self.pool, generate_packed, width, height, seed, params)
+            self.in_flight[key] = future
+            future.add_done_callback(lambda _: self._finish(key, future))
+        # Shielded so one client hanging up does not cancel the shared work
+        return await asyncio.shield(future)
+
+    def _finish(self, key, future):
+        del self.in_flight[key]
+        if future.cancelled() or future.exception() is not None:
+            self.counters['errors'] += 1
+            return
+        self.counters['generated'] += 1
+        record = future.result()
+        if len(record) > self.cache_bytes:
+            return
+        self.cache[key] = record
+        self.cached_bytes += len(record)
+        while self.cached_bytes > self.cache_bytes:
+            _, dropped = self.cache.popitem(last=False)
+            self.cached_bytes -= len(dropped)
+
+    def stats(self):
+        stats = dict(self.counters)
+        stats.update(cached_maps=len(self.cache), cached_bytes=self.cached_bytes, in_flight=len(self.in_flight))
+        return stats
+
+    def close(self):
+        self.pool.shutdown(cancel_futures=True)
+
+    async def handle(self, reader, writer):
+        # One keep-alive HTTP/1.1 connection: GET requests without bodies
+        try:
+            while True:
+                try:
+                    head = await reader.readuntil(b'\r\n\r\n')
+                except (asyncio.IncompleteReadError, asyncio.LimitOverrunError, ConnectionError):
+                    return
+                lines = head.decode('latin-1').split('\r\n')
+                try:
+                    method, target, version = lines[0].split(' ', 2)
+                except ValueError:
+                    await self.respond(writer, 400, b'malformed request line\n', close=True)
+                    return
+                headers = {}
+                for line in lines[1:]:
+                    name, _, value = line.partition(':')
+                    headers[name.strip().lower()] = value.strip().lower()
+                close = headers.get('connection') == 'close' or (
+                    version == 'HTTP/1.0' and headers.get('connection') != 'keep-alive')
+
+                status, body, content_type = await self.route(method, target)
+                await self.respond(writer, status, body, content_type, close)
+                if close:
+                    return
+        except ConnectionError:
+            # Client went away mid-response
+            pass
+        finally:
+            writer.close()
+
+    async def route(self, method, target):
+        if method != 'GET':
+            return 405, b'only GET is supported\n', 'text/plain'
+        url = urlsplit(target)
+        if url.path == '/stats':
+            return 200, json.dumps(self.stats()).encode('utf-8') + b'\n', 'application/json'
+        if url.path != '/map':
+            return 404, b'unknown path; use /map or /stats\n', 'text/plain'
+        try:
+            width, height, seed, params = parse_map_query(url.query)
+        except ValueError as e:
+            return 400, f"{e}\n".encode('utf-8'), 'text/plain'
+        try:
+            record = await self.get_map(width, height, seed, params)
+        except ValueError as e:
+            return 400, f"{e}\n".encode('utf-8'), 'text/plain'
+        except Exception as e:
+            return 500, f"generation failed: {e}\n".encode('utf-8'), 'text/plain'
+        return 200, record, 'application/octet-stream'
+
+    async def respond(self, writer, status, body, content_type='text/plain', close=False):
+        head = (f"HTTP/1.1 {status} {REASONS[status]}\r\n"
+                f"Content-Type: {content_type}\r\n"
+                f"Content-Length: {len(body)}\r\n"
+                f"Connection: {'close' if close else 'keep-alive'}\r\n\r\n")
+        writer.write(head.encode('latin-1') + body)
+        await writer.drain()
+
+
+async def run_server(host='127.0.0.1', port=DEFAULT_PORT, socket_path=None, workers=None,
+                     cache_bytes=DEFAULT_CACHE_BYTES, ready=None):
+    service = GenerationService(workers, cache_bytes)
+    try:
+        if socket_path:
+            server = await asyncio.start_unix_server(service.handle, socket_path)
+        else:
+            server = await asyncio.start_server(service.handle, host, port)
+        if ready is not None:
+            ready(server)
+        # Stop cleanly on SIGTERM so the worker pool is shut down with us
+        serving = asyncio.ensure_future(server.serve_forever())
+        try:
+            asyncio.get_running_loop().add_signal_handler(signal.SIGTERM, serving.cancel)
+        except (NotImplementedError, AttributeError):
+            pass
+        async with server:
+            try:
+                await serving
+            except asyncio.CancelledError:
+                pass
+    finally:
+        service.close()
+
+
+def serve(host='127.0.0.1', port=DEFAULT_PORT, socket_path=None, workers=None, cache_bytes=DEFAULT_CACHE_BYTES):
+    def ready(server):
+        where = socket_path or '%s:%d' % server.sockets[0].getsockname()[:2]
+        print(f"Serving maps on {where}", flush=True)
+    try:
+        asyncio.run(run_server(host, port, socket_path, workers, cache_bytes, ready))
+    except KeyboardInterrupt:
+        pass